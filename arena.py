@@ -0,0 +1,176 @@
+from simulation import (BOSS_SPAWN, DIRECTIONS, EAT, ENEMY_HIT, BOSS_HIT, ENEMY_WAVE, GAME_OVER, ITEM, LEVEL_UP,
+                        MIN_UPDATE_INTERVAL, LEVEL_SPEEDUP, Simulation, Snake, ticks)
+
+RESPAWN_TIME = 2.0  # seconds a dead player waits for a new snake
+
+
+class Player:
+    def __init__(self, player_id, name):
+        self.id = player_id
+        self.name = name
+        self.snake = None
+        self.score = 0
+        self.deaths = 0
+        self.respawn = 0  # tick when a dead player gets a new snake
+        # changes since the last snapshot: the direction of each step the head took
+        # (the snake's vacated list has the cells popped at the tail), a new body or a death
+        self.pushed = []
+        self.spawned = False
+        self.died = False
+
+
+class Arena(Simulation):
+    # the same rules for several snakes on one board. Players join and leave at any
+    # time, each snake dies on its own and comes back after RESPAWN_TIME, and the
+    # arena itself never ends. Food, items, enemies and bosses are shared; a snake
+    # running into another snake dies, just like running into itself
+    def reset(self):
+        super().reset()
+        # players bring their own snakes
+        self.snake.trim(len(self.snake.body))
+        self.snake = None
+        self.players = {}
+        self.next_id = 1
+        self.left = []  # ids that left since the last snapshot
+        self.enemy_version = 0  # bumped whenever enemies or bosses change
+        self.boss_version = 0
+
+    def join(self, name=""):
+        player = Player(self.next_id, name)
+        self.next_id += 1
+        self.players[player.id] = player
+        self.spawn(player)
+        return player
+
+    def leave(self, player_id):
+        player = self.players.pop(player_id)
+        if player.snake is not None:
+            player.snake.trim(len(player.snake.body))
+        self.left.append(player_id)
+
+    def spawn(self, player):
+        cell = self.grid.random_free(self.rng)
+        if cell is None:
+            return
+        x, y = self.grid.pos(cell)
+        snake = Snake(x, y, self.width, self.height, self.grid, player.id)
+        snake.direction = self.rng.choice(DIRECTIONS)
+        snake.vacated = []
+        player.snake = snake
+        player.pushed.clear()
+        player.spawned = True
+
+    def kill(self, player, cause):
+        player.snake.trim(len(player.snake.body))
+        player.snake = None
+        player.deaths += 1
+        player.respawn = self.ticks + ticks(RESPAWN_TIME)
+        player.died = True
+        self.emit(GAME_OVER, (player.id, cause))
+
+    def change_direction(self, player_id, direction):
+        player = self.players.get(player_id)
+        if player is not None and player.snake is not None:
+            player.snake.change_direction(direction, self.ticks)
+
+    def owner(self, cell):
+        if not self.grid.snake[cell]:
+            return None
+        return self.players.get(self.grid.owner[cell])
+
+    def enemy_hit(self, cell):
+        player = self.owner(cell)
+        player.snake.pop_tail()
+        self.emit(ENEMY_HIT, player.id)
+        if len(player.snake.body) == 0:
+            self.kill(player, "enemy")
+        return False
+
+    def boss_hit(self, cells):
+        grid = self.grid
+        hit = {grid.owner[cell] for cell in cells if grid.snake[cell]}
+        for player in list(self.players.values()):
+            snake = player.snake
+            if snake is None or player.id not in hit:
+                continue
+            snake.trim(10)
+            self.emit(BOSS_HIT, player.id)
+            if len(snake.body) <= 1:
+                self.kill(player, "boss")
+        return False
+
+    def boss_targets(self):
+        return [self.grid.cell(player.snake.head) for player in self.players.values() if player.snake is not None]
+
+    def step_enemies(self):
+        super().step_enemies()
+        self.enemy_version += 1
+
+    def step_bosses(self):
+        if self.bosses:
+            super().step_bosses()
+            self.boss_version += 1
+
+    def add_boss(self):
+        self.bosses.append(self.generate_boss())
+        self.boss_version += 1
+        self.emit(BOSS_SPAWN)
+
+    def step_snake(self):
+        for player in list(self.players.values()):
+            if player.snake is not None:
+                self.step_player(player)
+            elif self.ticks >= player.respawn:
+                self.spawn(player)
+
+        if not self.food:
+            self.set_food(self.generate_food())
+        if not self.items:
+            self.set_items(self.generate_item())
+
+    def step_player(self, player):
+        snake = player.snake
+        new_head = snake.move()
+        player.pushed.append(DIRECTIONS.index(snake.direction))
+
+        if snake.check_collision():
+            self.kill(player, "snake")
+            return
+
+        food = self.food_at.get(new_head)
+        if food is not None:
+            snake.grow_snake(food["bonus"] + 1)
+            player.score += food["bonus"] + 1
+            self.emit(EAT, (player.id, food["bonus"]))
+            self.set_food(self.generate_food())
+            self.food_collected += 1
+            if self.food_collected % 10 == 0:
+                self.level += 1
+                speedup = ticks(LEVEL_SPEEDUP)
+                floor = ticks(MIN_UPDATE_INTERVAL)
+                self.snake_interval = max(floor, self.snake_interval - speedup)
+                self.enemy_interval = max(floor, self.enemy_interval - speedup)
+                self.boss_interval = max(floor, self.boss_interval - speedup)
+                self.emit(LEVEL_UP, self.level)
+            if self.food_collected % 15 == 0:
+                self.add_boss()
+
+        item = self.item_at.get(new_head)
+        if item is not None:
+            self.emit(ITEM, (player.id, item["type"]))
+            if item["type"] == 0:
+                snake.grow_snake(5)
+            elif item["type"] == 1:
+                snake.trim(5 if len(snake.body) > 5 else len(snake.body) - 1)
+                if len(snake.body) == 1:
+                    self.kill(player, "item")
+            elif item["type"] == 2:
+                self.set_enemies(self.generate_enemies())
+                self.enemy_version += 1
+                self.emit(ENEMY_WAVE)
+            elif item["type"] == 3:
+                self.enemies.extend(self.generate_enemies())
+                self.enemy_version += 1
+            elif item["type"] == 4:
+                self.add_boss()
+            self.set_items(self.generate_item())
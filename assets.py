@@ -0,0 +1,241 @@
+import hashlib
+import json
+import mmap
+import os
+import struct
+from concurrent.futures import ThreadPoolExecutor
+
+import pygame
+
+from simulation import BLOCK_SIZE
+
+ASSET_WORKERS = 4
+CACHE_FILE = 'assets.cache'
+CACHE_MAGIC = b"CBRC"
+CACHE_VERSION = 1
+SPRITE = (BLOCK_SIZE, BLOCK_SIZE)
+SPRITE_ANGLES = {
+    (0, 1): 0,
+    (0, -1): 180,
+    (1, 0): 90,
+    (-1, 0): -90,
+}
+
+# (grupo, tipo, arquivo, chave, tamanho); "menu" loads first so the menu opens early.
+# "music" tracks are streamed by pygame.mixer.music instead of decoded into a Sound
+ASSETS = [
+    ("menu", "image", 'menu.png', ("menu_background",), None),
+    ("menu", "music", 'menu.wav', ("menu_sound",), None),
+    ("game", "image", 'game.png', ("game_background",), None),
+    ("game", "rotations", 'cobra.png', ("snake_head",), SPRITE),
+    ("game", "image", 'body.png', ("snake_body",), SPRITE),
+    ("game", "image", 'maca.png', ("food", 0), SPRITE),
+    ("game", "image", 'laranja.png', ("food", 1), SPRITE),
+    ("game", "image", 'pera.png', ("food", 2), SPRITE),
+    ("game", "image", 'uva.png', ("food", 3), SPRITE),
+    ("game", "image", 'item.png', ("item",), SPRITE),
+    ("game", "rotations", 'inimigo.png', ("enemy",), SPRITE),
+    ("game", "rotations", 'boss.png', ("boss",), (BLOCK_SIZE * 2, BLOCK_SIZE * 2)),
+    ("game", "music", 'game.wav', ("game_sound",), None),
+    ("game", "sound", 'eat.wav', ("eat",), None),
+    ("game", "sound", 'inimigo.wav', ("enemy",), None),
+    ("game", "sound", 'go.wav', ("game_over",), None),
+    ("game", "sound", 'nvl.wav', ("level_up",), None),
+    ("game", "sound", 'boss.wav', ("boss",), None),
+    ("game", "sound", 'item.wav', ("item",), None),
+    ("game", "sound", 'inimigo_death.wav', ("enemy_death",), None),
+    ("game", "sound", 'boss_death.wav', ("boss_death",), None),
+    ("score", "image", 'score.png', ("score_background",), None),
+    ("score", "music", 'score.wav', ("score_sound",), None),
+    ("how_to_play", "image", 'tutorial.png', ("how_image",), None),
+]
+
+
+# func
+def carregar_som(caminho):
+    try:
+        return pygame.mixer.Sound(caminho)
+    except (pygame.error, FileNotFoundError) as e:
+        print(f"Erro no som: {e}")
+        return None
+
+
+def decode_image(caminho, size):
+    image = pygame.image.load(caminho)
+    if size is not None:
+        image = pygame.transform.scale(image, size)
+    return image
+
+
+def to_display(image):
+    # needs the display, so it only runs on the main thread
+    if image.get_flags() & pygame.SRCALPHA:
+        return image.convert_alpha()
+    return image.convert()
+
+
+def rotate_image(image, direction):
+    return pygame.transform.rotate(image, SPRITE_ANGLES[direction])
+
+
+def rotations(image):
+    # one pre-rotated, display-format copy per direction
+    return {direction: rotate_image(image, direction).convert_alpha() for direction in SPRITE_ANGLES}
+
+
+def file_hash(caminho):
+    with open(caminho, 'rb') as f:
+        return hashlib.sha1(f.read()).hexdigest()
+
+
+def build_cache(assets=ASSETS, caminho=CACHE_FILE):
+    # scaled sprites go side by side in one RGBA atlas, full-size images as raw buffers
+    images = [(path, size) for group, kind, path, key, size in assets if kind not in ("sound", "music")]
+    sprites = [(path, size) for path, size in images if size is not None]
+    atlas = pygame.Surface((sum(size[0] for path, size in sprites),
+                            max(size[1] for path, size in sprites)), pygame.SRCALPHA)
+    entries = {}
+    x = 0
+    for path, size in sprites:
+        # BLEND_RGBA_MAX onto the zeroed atlas copies pixels exactly, alpha included
+        atlas.blit(decode_image(path, size), (x, 0), special_flags=pygame.BLEND_RGBA_MAX)
+        entries[path] = {"hash": file_hash(path), "rect": [x, 0, size[0], size[1]]}
+        x += size[0]
+
+    blobs = [pygame.image.tostring(atlas, "RGBA")]
+    header = {"block_size": BLOCK_SIZE, "atlas": {"size": list(atlas.get_size()), "offset": 0},
+              "images": entries}
+    offset = len(blobs[0])
+    for path, size in images:
+        if size is not None:
+            continue
+        image = pygame.image.load(path)
+        fmt = "RGBA" if image.get_flags() & pygame.SRCALPHA else "RGB"
+        blobs.append(pygame.image.tostring(image, fmt))
+        entries[path] = {"hash": file_hash(path), "offset": offset,
+                         "size": list(image.get_size()), "format": fmt}
+        offset += len(blobs[-1])
+
+    encoded = json.dumps(header).encode()
+    with open(caminho, 'wb') as f:
+        f.write(CACHE_MAGIC + struct.pack("<II", CACHE_VERSION, len(encoded)) + encoded)
+        for blob in blobs:
+            f.write(blob)
+
+
+class AssetCache:
+    # maps the file built by build_cache; surfaces point straight into the mapping
+    def __init__(self, caminho=CACHE_FILE):
+        with open(caminho, 'rb') as f:
+            self.map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        if self.map[:4] != CACHE_MAGIC:
+            raise ValueError(f"{caminho} nao e um cache de assets")
+        version, header_size = struct.unpack_from("<II", self.map, 4)
+        header = json.loads(self.map[12:12 + header_size])
+        if version != CACHE_VERSION or header["block_size"] != BLOCK_SIZE:
+            raise ValueError(f"{caminho} foi gerado para outra versao ou BLOCK_SIZE")
+        self.data = memoryview(self.map)[12 + header_size:]
+        self.entries = header["images"]
+        width, height = header["atlas"]["size"]
+        self.atlas = pygame.image.frombuffer(self.data[:width * height * 4], (width, height), "RGBA")
+
+    def image(self, caminho):
+        entry = self.entries.get(caminho)
+        if entry is None or entry["hash"] != file_hash(caminho):
+            return None
+        if "rect" in entry:
+            return self.atlas.subsurface(entry["rect"])
+        width, height = entry["size"]
+        start = entry["offset"]
+        end = start + width * height * len(entry["format"])
+        return pygame.image.frombuffer(self.data[start:end], (width, height), entry["format"])
+
+
+def open_cache(caminho):
+    try:
+        return AssetCache(caminho)
+    except (OSError, ValueError, KeyError):
+        return None
+
+
+class AssetLoader:
+    # decodes PNGs and WAVs on a thread pool; poll() finishes them on the main thread
+    def __init__(self, assets=ASSETS, workers=ASSET_WORKERS, cache=CACHE_FILE):
+        self.cache = open_cache(cache) if cache else None
+        self.images = {"food": {}}
+        self.sounds = {}
+        self.music = {}
+        self.executor = ThreadPoolExecutor(workers)
+        self.pending = []
+        self.missing = {}
+        for group, kind, caminho, key, size in assets:
+            if kind == "music":
+                if os.path.exists(caminho):
+                    self.music[key[-1]] = caminho
+                else:
+                    print(f"Erro no som: {caminho} nao encontrado")
+                continue
+            if kind == "sound":
+                future = self.executor.submit(carregar_som, caminho)
+            else:
+                future = self.executor.submit(self.load_image, caminho, size)
+            self.pending.append((group, kind, key, future))
+            self.missing[group] = self.missing.get(group, 0) + 1
+        self.total = len(self.pending)
+
+    def load_image(self, caminho, size):
+        image = self.cache.image(caminho) if self.cache is not None else None
+        if image is None:
+            image = decode_image(caminho, size)
+        return image
+
+    def poll(self):
+        finished = [entry for entry in self.pending if entry[3].done()]
+        for entry in finished:
+            self.pending.remove(entry)
+            self.finish(*entry)
+        if not self.pending:
+            self.executor.shutdown(wait=False)
+            self.cache = None
+        return len(finished)
+
+    def wait(self):
+        while self.pending:
+            self.pending[0][3].result()
+            self.poll()
+
+    def finish(self, group, kind, key, future):
+        value = future.result()
+        if kind == "sound":
+            target = self.sounds
+        else:
+            target = self.images
+            value = rotations(value) if kind == "rotations" else to_display(value)
+        for part in key[:-1]:
+            target = target[part]
+        target[key[-1]] = value
+        self.missing[group] -= 1
+
+    def ready(self, group):
+        self.poll()
+        return self.missing.get(group, 0) == 0
+
+    def done(self):
+        return not self.pending
+
+    def progress(self):
+        return (self.total - len(self.pending)) / self.total
+
+
+if __name__ == "__main__":
+    import argparse
+    import time
+
+    parser = argparse.ArgumentParser(description="cache de assets pre-escalados")
+    parser.add_argument("comando", choices=["build"])
+    parser.add_argument("--output", default=CACHE_FILE)
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    build_cache(caminho=args.output)
+    print(f"{args.output}: {os.path.getsize(args.output) / 1024:.0f} KB em {time.perf_counter() - start:.2f}s")
@@ -0,0 +1,109 @@
+import time
+
+import pygame
+
+MIXER_FREQUENCY = 44100
+MIXER_BUFFER = 512  # samples, about 12 ms; SDL's default of 4096 is an audible ~90 ms
+MIXER_CHANNELS = 16
+RESERVED_CHANNELS = 2  # kept free of everyday effects for the critical cues
+CRITICAL = 2  # effects at this priority or above may use the reserved channels
+
+# efeito: (prioridade, intervalo minimo entre dois toques em segundos). A higher
+# priority may cut a lower one short when every channel is busy
+EFFECTS = {
+    "game_over": (3, 0.0),
+    "level_up": (3, 0.0),
+    "boss": (2, 0.25),
+    "boss_death": (2, 0.1),
+    "item": (1, 0.05),
+    "enemy": (1, 0.1),
+    "eat": (1, 0.05),
+    "enemy_death": (0, 0.08),
+}
+DEFAULT_EFFECT = (1, 0.05)
+
+
+# func
+def pre_init(buffer=MIXER_BUFFER):
+    # has to run before pygame.init() for the buffer size to stick
+    pygame.mixer.pre_init(MIXER_FREQUENCY, -16, 2, buffer)
+
+
+class ChannelManager:
+    # plays the effects on channels it picks itself. play() only records the request;
+    # flush(), once a frame, plays each requested effect once however many times it
+    # was asked for (30 enemy deaths in a frame are one sound), skips effects played
+    # too recently, and puts the rest on a free channel, or else on the one playing
+    # the least important effect, if that is less important than the new one. Music
+    # streams through pygame.mixer.music and needs no channel
+    def __init__(self, sounds, channels=MIXER_CHANNELS, reserved=RESERVED_CHANNELS, effects=EFFECTS,
+                 clock=time.perf_counter):
+        pygame.mixer.set_num_channels(channels)
+        pygame.mixer.set_reserved(reserved)
+        self.sounds = sounds
+        self.effects = effects
+        self.clock = clock
+        self.reserved = [pygame.mixer.Channel(i) for i in range(reserved)]
+        self.pool = [pygame.mixer.Channel(i) for i in range(reserved, channels)]
+        self.owners = {}  # channel -> (priority, started, name) of what was last put on it
+        self.last_played = {}
+        self.requests = {}  # name -> loop, for the next flush
+        self.played = self.coalesced = self.limited = self.stolen = self.dropped = 0
+
+    def play(self, name, loop=False):
+        if name in self.requests:
+            self.coalesced += 1
+        self.requests[name] = self.requests.get(name, False) or loop
+
+    def flush(self):
+        if not self.requests:
+            return
+        now = self.clock()
+        # most important first, so they get the free channels
+        for name, loop in sorted(self.requests.items(), key=lambda r: -self.effect(r[0])[0]):
+            sound = self.sounds.get(name)
+            if sound is None:
+                continue
+            priority, interval = self.effect(name)
+            if now - self.last_played.get(name, -interval) < interval:
+                self.limited += 1
+                continue
+            channel = self.channel(priority)
+            if channel is None:
+                self.dropped += 1
+                continue
+            channel.play(sound, loops=-1 if loop else 0)
+            self.owners[channel] = (priority, now, name)
+            self.last_played[name] = now
+            self.played += 1
+        self.requests.clear()
+
+    def effect(self, name):
+        return self.effects.get(name, DEFAULT_EFFECT)
+
+    def channel(self, priority):
+        channels = self.reserved + self.pool if priority >= CRITICAL else self.pool
+        for channel in channels:
+            if not channel.get_busy():
+                return channel
+        # all busy: cut short the least important effect, the oldest one among equals
+        victim = min(channels, key=lambda c: self.owners.get(c, (-1, 0.0))[:2])
+        if self.owners.get(victim, (-1,))[0] >= priority:
+            return None
+        self.stolen += 1
+        return victim
+
+    def stop(self, name):
+        for channel, (_, _, playing) in self.owners.items():
+            if playing == name:
+                channel.stop()
+
+    def stop_all(self):
+        # one call into the mixer instead of a stop() per Sound
+        pygame.mixer.stop()
+        self.requests.clear()
+
+    def set_volume(self, volume):
+        for sound in self.sounds.values():
+            if sound is not None:
+                sound.set_volume(volume)
@@ -0,0 +1,1033 @@
+import argparse
+import json
+import os
+import platform
+import statistics
+import random
+import subprocess
+import sys
+import tempfile
+import time
+
+from profiler import percentile
+from simulation import BLOCK_SIZE, TICK, Simulation
+
+PERCENTILES = (50, 90, 99)
+
+
+# func
+def build_snake(sim, length):
+    # serpentine body filling the bottom rows, head on top moving up into free space
+    cols = sim.width // BLOCK_SIZE
+    rows = sim.height // BLOCK_SIZE
+    filled_rows = -(-length // cols)
+    top = rows - filled_rows
+    positions = []
+    for i in range(length):
+        row = top + i // cols
+        col = i % cols if (row - top) % 2 == 0 else cols - 1 - i % cols
+        positions.append((col * BLOCK_SIZE, row * BLOCK_SIZE))
+    sim.snake.place(positions)
+    sim.snake.direction = (0, -1)
+    sim.snake.turns.clear()
+
+
+def stress_sim(length, enemies, bosses=0, seed=0, vectorized=False):
+    cols = 200
+    rows = 2 * (-(-length // cols)) + max(100, 4 * enemies // cols)
+    sim = Simulation(cols * BLOCK_SIZE, rows * BLOCK_SIZE, seed=seed, vectorized=vectorized)
+    build_snake(sim, length)
+    sim.set_food([])
+    sim.set_items([])
+    sim.set_enemies([])
+    spawned = []
+    while len(spawned) < enemies:
+        spawned.extend(sim.generate_enemies())
+    sim.release_enemies(spawned[enemies:])
+    sim.set_enemies(spawned[:enemies])
+    sim.bosses = [sim.generate_boss() for _ in range(bosses)]
+    return sim
+
+
+def time_steps(sim, steps):
+    # one step = one snake interval of ticks (a snake move; enemies move every few)
+    start = time.perf_counter()
+    for _ in range(steps):
+        sim.run(sim.snake_interval)
+        if sim.over:
+            break
+    return (time.perf_counter() - start) / steps
+
+
+def stress(args):
+    print(f"{'segmentos':>10} {'inimigos':>9} {'us/passo':>10}")
+    for length in args.lengths:
+        for enemies in args.enemies:
+            sim = stress_sim(length, enemies)
+            per_step = time_steps(sim, args.steps)
+            print(f"{length:>10} {enemies:>9} {per_step * 1e6:>10.1f}")
+
+
+def swarm(args):
+    print(f"{'inimigos':>9} {'lista ms':>9} {'numpy ms':>9}")
+    for enemies in args.enemies:
+        row = []
+        for vectorized in (False, True):
+            sim = stress_sim(args.length, enemies, vectorized=vectorized)
+            start = time.perf_counter()
+            for _ in range(args.steps):
+                sim.step_enemies()
+            row.append((time.perf_counter() - start) / args.steps)
+        print(f"{enemies:>9} {row[0] * 1e3:>9.2f} {row[1] * 1e3:>9.2f}")
+
+
+def bosses(args):
+    print(f"{'bosses':>7} {'ms/passo':>9} {'campo ms':>9}")
+    for count in args.bosses:
+        sim = Simulation(seed=0)
+        sim.set_enemies([])
+        build_snake(sim, args.length)
+        sim.bosses = [sim.generate_boss() for _ in range(count)]
+        start = time.perf_counter()
+        for _ in range(args.steps):
+            sim.step_bosses()
+        per_step = (time.perf_counter() - start) / args.steps
+        start = time.perf_counter()
+        for _ in range(args.steps):
+            sim.grid.distances([sim.grid.cell(sim.snake.head)])
+        field = (time.perf_counter() - start) / args.steps
+        print(f"{count:>7} {per_step * 1e3:>9.3f} {field * 1e3:>9.3f}")
+
+
+def body_memory(args):
+    length = args.length
+    sim = stress_sim(length, 0)
+    body = sim.snake.body
+    ring_bytes = sys.getsizeof(body.cells)
+    tuples = list(sim.snake.positions())
+    list_bytes = sys.getsizeof(tuples) + sum(sys.getsizeof(pos) for pos in tuples)
+
+    start = time.perf_counter()
+    for _ in range(args.steps):
+        sim.snake.grow_snake(1)
+        sim.snake.move()
+    ring_move = (time.perf_counter() - start) / args.steps
+    start = time.perf_counter()
+    for _ in range(args.steps):
+        tuples.insert(0, tuples[0])
+        tuples.pop()
+    list_move = (time.perf_counter() - start) / args.steps
+    start = time.perf_counter()
+    for _ in range(args.steps):
+        tuples = tuples[:-5]
+        tuples.extend(tuples[-5:])
+    list_trim = (time.perf_counter() - start) / args.steps
+    start = time.perf_counter()
+    for _ in range(args.steps):
+        sim.snake.trim(5)
+        sim.snake.grow_snake(5)
+    ring_trim = (time.perf_counter() - start) / args.steps
+
+    print(f"corpo com {length} segmentos")
+    print(f"  ring buffer:    {ring_bytes / 1024:10.1f} KB  move {ring_move * 1e6:6.2f} us  corte {ring_trim * 1e6:6.2f} us")
+    print(f"  lista de tuplas:{list_bytes / 1024:10.1f} KB  move {list_move * 1e6:6.2f} us  corte {list_trim * 1e6:6.2f} us")
+
+
+def headless_game(world=None):
+    os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+    os.environ.setdefault("SDL_AUDIODRIVER", "dummy")
+    import cobrinhafix
+    game = cobrinhafix.Game(world=world)
+    game.load_assets()
+    game.reset()
+    game.state = cobrinhafix.JOGO
+    game.draw_game()
+    return game
+
+
+class RotateOnLookup(dict):
+    # reproduces the old per-frame pygame.transform.rotate for comparison
+    def __init__(self, image):
+        super().__init__()
+        self.image = image
+
+    def __getitem__(self, direction):
+        from assets import rotate_image
+        return rotate_image(self.image, direction)
+
+
+def time_frames(game, frames, full=False):
+    # advance about one 60 Hz frame of simulation between draws, timing only the draw
+    total = 0.0
+    for _ in range(frames):
+        game.sim.run(3)
+        if full:
+            game.renderer.invalidate()
+        start = time.perf_counter()
+        game.draw_game()
+        game.present()
+        total += time.perf_counter() - start
+    return total / frames
+
+
+def render(args):
+    game = headless_game()
+    sim = game.sim
+    build_snake(sim, args.length)
+    sim.set_enemies([])
+    while len(sim.enemies) < args.enemies:
+        sim.enemies.extend(sim.generate_enemies())
+    sim.bosses = [sim.generate_boss() for _ in range(args.bosses)]
+
+    full = time_frames(game, args.frames, full=True)
+    cached = time_frames(game, args.frames)
+    for key in ("snake_head", "enemy", "boss"):
+        game.images[key] = RotateOnLookup(game.images[key][(0, 1)])
+    rotating = time_frames(game, args.frames)
+
+    print(f"draw_game com {args.length} segmentos, {len(sim.enemies)} inimigos e {args.bosses} bosses")
+    print(f"  redesenho completo:       {full * 1e3:7.3f} ms/quadro")
+    print(f"  dirty rects:              {cached * 1e3:7.3f} ms/quadro")
+    print(f"  rotate a cada quadro:     {rotating * 1e3:7.3f} ms/quadro")
+
+
+def world(args):
+    # same view, ever bigger worlds with enemies in proportion: the frame time should stay flat
+    print(f"{'mundo':>11} {'inimigos':>9} {'ms/quadro':>10} {'chunks':>7}")
+    for side in args.sizes:
+        game = headless_game(world=(side, side))
+        sim = game.sim = Simulation(side * BLOCK_SIZE, side * BLOCK_SIZE, seed=0, vectorized=True)
+        build_snake(sim, args.length)
+        spawned = []
+        while len(spawned) < args.density * side * side:
+            spawned.extend(sim.generate_enemies())
+        sim.set_enemies(spawned)
+        sim.bosses = [sim.generate_boss() for _ in range(args.bosses)]
+        per_frame = time_frames(game, args.frames)
+        print(f"{side:>5}x{side:<5} {len(sim.enemies):>9} {per_frame * 1e3:>10.3f} {len(game.renderer.chunks):>7}")
+
+
+def rejection_cell(sim):
+    # the old approach: draw random cells until one is empty
+    grid = sim.grid
+    while True:
+        cell = sim.rng.randrange(len(grid.load))
+        if not grid.load[cell]:
+            return cell
+
+
+def spawn(args):
+    print(f"{'ocupacao':>9} {'livres':>7} {'indice us':>10} {'rejeicao us':>12}")
+    for fill in args.fills:
+        sim = Simulation(seed=0)
+        sim.set_food([])
+        sim.set_items([])
+        sim.set_enemies([])
+        cells = len(sim.grid.load)
+        build_snake(sim, min(cells - 1, round(cells * fill)))
+
+        start = time.perf_counter()
+        for _ in range(args.spawns):
+            sim.release_cells([{"pos": sim.spawn_cell()}])
+        indexed = (time.perf_counter() - start) / args.spawns
+
+        start = time.perf_counter()
+        for _ in range(args.spawns):
+            rejection_cell(sim)
+        rejection = (time.perf_counter() - start) / args.spawns
+        print(f"{fill:>9.0%} {sim.grid.free_count:>7} {indexed * 1e6:>10.2f} {rejection * 1e6:>12.2f}")
+
+
+def cpu_share(loop, seconds):
+    start_cpu = time.process_time()
+    start = time.perf_counter()
+    while time.perf_counter() - start < seconds:
+        loop()
+    return (time.process_time() - start_cpu) / (time.perf_counter() - start)
+
+
+def idle(args):
+    import cobrinhafix
+    game = headless_game()
+    game.state = cobrinhafix.MENU
+
+    def redraw_every_frame():
+        game.clock.tick(cobrinhafix.FPS)
+        game.handle_events()
+        game.draw_menu()
+        game.present()
+
+    old = cpu_share(redraw_every_frame, args.seconds)
+    new = cpu_share(game.run_frame, args.seconds)
+    print(f"CPU parado no menu ({args.seconds:.0f}s cada)")
+    print(f"  redesenho a 60 FPS: {old * 100:5.1f}% de um nucleo")
+    print(f"  espera por eventos: {new * 100:5.1f}% de um nucleo")
+
+
+def startup_probe(mode):
+    # runs in a fresh process; times are measured from before pygame is imported
+    start = time.perf_counter()
+    os.environ["SDL_VIDEODRIVER"] = "dummy"
+    os.environ["SDL_AUDIODRIVER"] = "dummy"
+    import cobrinhafix
+    result = {}
+    if mode == "sync":
+        game = cobrinhafix.Game(asset_workers=1, asset_cache=None)
+        game.load_assets()
+        game.run_frame()
+        result["first_frame"] = result["menu"] = result["all"] = time.perf_counter() - start
+    else:
+        game = cobrinhafix.Game(asset_cache=cobrinhafix.CACHE_FILE if mode == "cache" else None)
+        game.run_frame()
+        result["first_frame"] = time.perf_counter() - start
+        while game.state != cobrinhafix.MENU:
+            game.run_frame()
+        result["menu"] = time.perf_counter() - start
+        game.load_assets()
+        result["all"] = time.perf_counter() - start
+    print(json.dumps(result))
+
+
+def run_probe(mode):
+    out = subprocess.run([sys.executable, __file__, "startup", "--probe", mode],
+                         capture_output=True, text=True, check=True).stdout
+    return json.loads(out.strip().splitlines()[-1])
+
+
+def startup(args):
+    if args.probe:
+        startup_probe(args.probe)
+        return
+    print(f"inicializacao ate o primeiro quadro (mediana de {args.repeat} execucoes)")
+    modes = [("sync", "carga sequencial"), ("async", "carga em paralelo")]
+    if os.path.exists("assets.cache"):
+        modes.append(("cache", "paralelo com cache"))
+    for mode, label in modes:
+        runs = [run_probe(mode) for _ in range(args.repeat)]
+        first = statistics.median(run["first_frame"] for run in runs)
+        menu = statistics.median(run["menu"] for run in runs)
+        every = statistics.median(run["all"] for run in runs)
+        print(f"  {label:18} primeiro quadro {first * 1e3:7.1f} ms  menu {menu * 1e3:7.1f} ms  "
+              f"tudo {every * 1e3:7.1f} ms")
+
+
+def image_load(args):
+    os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+    import assets
+    images = [(path, size) for group, kind, path, key, size in assets.ASSETS if kind not in ("sound", "music")]
+    start = time.perf_counter()
+    for path, size in images:
+        assets.decode_image(path, size)
+    png = time.perf_counter() - start
+    print(f"{len(images)} imagens")
+    print(f"  PNG + scale: {png * 1e3:7.2f} ms")
+    cache = assets.open_cache(assets.CACHE_FILE)
+    if cache is None:
+        print("  sem assets.cache (gere com: python assets.py build)")
+        return
+    start = time.perf_counter()
+    for path, size in images:
+        cache.image(path)
+    print(f"  cache mmap:  {(time.perf_counter() - start) * 1e3:7.2f} ms")
+
+
+def rss_kb():
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") // 1024
+    except OSError:
+        import resource
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+
+def music_probe(mode):
+    os.environ["SDL_AUDIODRIVER"] = "dummy"
+    import pygame
+    import assets
+    pygame.mixer.init()
+    tracks = [path for group, kind, path, key, size in assets.ASSETS if kind == "music" and os.path.exists(path)]
+    before = rss_kb()
+    if mode == "sound":
+        loaded = [pygame.mixer.Sound(path) for path in tracks]
+        loaded[0].play(loops=-1)
+    else:
+        pygame.mixer.music.load(tracks[0])
+        pygame.mixer.music.play(-1)
+    time.sleep(0.5)
+    print(json.dumps({"tracks": tracks, "kb": rss_kb() - before}))
+
+
+def music_memory(args):
+    if args.probe:
+        music_probe(args.probe)
+        return
+    results = {}
+    for mode in ("sound", "music"):
+        out = subprocess.run([sys.executable, __file__, "music", "--probe", mode],
+                             capture_output=True, text=True, check=True).stdout
+        results[mode] = json.loads(out.strip().splitlines()[-1])
+    print(f"memoria residente das musicas de fundo ({', '.join(results['sound']['tracks'])})")
+    print(f"  mixer.Sound: {results['sound']['kb'] / 1024:7.1f} MB")
+    print(f"  mixer.music: {results['music']['kb'] / 1024:7.1f} MB")
+
+
+def audio_load(args):
+    # a few seconds of heavy play in real time (channels free up as sounds finish):
+    # every frame some enemies die, now and then food, a boss or a level up
+    os.environ["SDL_AUDIODRIVER"] = "dummy"
+    import pygame
+    import audio
+    import assets
+    audio.pre_init(args.buffer)
+    pygame.mixer.init()
+    sounds = {key[-1]: assets.carregar_som(path) for group, kind, path, key, size in assets.ASSETS
+              if kind == "sound"}
+    critical = {name for name, (priority, _) in audio.EFFECTS.items() if priority >= audio.CRITICAL}
+
+    def frames(play):
+        rng = random.Random(0)
+        for _ in range(round(args.seconds * 60)):
+            for _ in range(rng.randrange(args.deaths + 1)):
+                play("enemy_death")
+            if rng.random() < 0.1:
+                play("eat")
+            if rng.random() < 0.02:
+                play("boss")
+            if rng.random() < 0.01:
+                play("level_up")
+            yield
+            time.sleep(1 / 60)
+
+    requests = {"total": 0, "critical": 0}
+    lost = {"total": 0, "critical": 0}
+
+    def naive(name):
+        requests["total"] += 1
+        requests["critical"] += name in critical
+        if sounds[name].play() is None:
+            lost["total"] += 1
+            lost["critical"] += name in critical
+
+    pygame.mixer.set_num_channels(8)
+    for _ in frames(naive):
+        pass
+    pygame.mixer.stop()
+    print(f"mixer {pygame.mixer.get_init()}, buffer {args.buffer} amostras "
+          f"(~{args.buffer / audio.MIXER_FREQUENCY * 1e3:.0f} ms), ate {args.deaths} inimigos mortos por quadro")
+    print(f"  Sound.play(), 8 canais: {requests['total']} pedidos, {lost['total']} perdidos, "
+          f"{lost['critical']} de {requests['critical']} criticos perdidos")
+
+    manager = audio.ChannelManager(sounds)
+    asked = lost_critical = 0
+    for _ in frames(manager.play):
+        pending = {name: manager.last_played.get(name) for name in manager.requests if name in critical}
+        manager.flush()
+        asked += len(pending)
+        lost_critical += sum(manager.last_played.get(name) == last for name, last in pending.items())
+    print(f"  ChannelManager, {audio.MIXER_CHANNELS} canais: {manager.played} tocados, {manager.coalesced} agrupados, "
+          f"{manager.limited} limitados, {manager.stolen} interrompidos, {manager.dropped} perdidos, "
+          f"{lost_critical} de {asked} criticos perdidos")
+
+
+def write_scores(caminho, count, seed=0):
+    rng = random.Random(seed)
+    with open(caminho, 'w') as f:
+        for i in range(count):
+            if i % 1000 == 999:
+                f.write("ss a-qwe123 sem virgula\n")
+            else:
+                f.write(f"jogador{i},{rng.randint(-50, 500)}.0\n")
+
+
+def leaderboard(args):
+    from leaderboard import Leaderboard
+    with tempfile.TemporaryDirectory() as pasta:
+        caminho = os.path.join(pasta, "score.txt")
+        write_scores(caminho, args.entries)
+
+        start = time.perf_counter()
+        scores = []
+        with open(caminho) as f:
+            for linha in f:
+                nome, sep, score = linha.strip().rpartition(',')
+                if sep:
+                    scores.append((nome, float(score)))
+        scores.sort(key=lambda x: x[1], reverse=True)
+        old_load = time.perf_counter() - start
+
+        start = time.perf_counter()
+        board = Leaderboard(caminho)
+        load = time.perf_counter() - start
+
+        start = time.perf_counter()
+        for i in range(args.saves):
+            board.add(f"novo{i}", float(i % 600))
+        save = (time.perf_counter() - start) / args.saves
+
+        start = time.perf_counter()
+        for _ in range(1000):
+            board.top(10)
+        top = (time.perf_counter() - start) / 1000
+
+    print(f"placar com {args.entries} linhas")
+    print(f"  lista completa + sort:  {old_load * 1e3:8.1f} ms")
+    print(f"  Leaderboard (top {board.size}): {load * 1e3:8.1f} ms")
+    print(f"  salvar: {save * 1e6:.1f} us/placar   top 10: {top * 1e6:.2f} us")
+
+
+def telemetry_load(args):
+    # per event on the game thread: an open/append/close like the score file vs the queued writer
+    from telemetry import TelemetryWriter
+    with tempfile.TemporaryDirectory() as pasta:
+        caminho = os.path.join(pasta, "sync.jsonl")
+        sync = []
+        for i in range(args.events):
+            start = time.perf_counter()
+            with open(caminho, 'a') as f:
+                f.write(json.dumps({"e": "enemy_death", "t": time.time(), "tick": i}, separators=(",", ":")) + "\n")
+            sync.append(time.perf_counter() - start)
+
+        writer = TelemetryWriter(pasta, session="bench", rotate_bytes=args.rotate)
+        queued = []
+        for i in range(args.events):
+            start = time.perf_counter()
+            writer.record("enemy_death", tick=i)
+            queued.append(time.perf_counter() - start)
+        start = time.perf_counter()
+        writer.close()
+        drain = time.perf_counter() - start
+        files = len(os.listdir(pasta)) - 1
+
+    print(f"{args.events} eventos, tempo na thread do jogo por evento (us)")
+    for name, samples in (("open/append", sync), ("TelemetryWriter", queued)):
+        summary = summarize(samples)
+        print(f"  {name:16} " + "  ".join(f"p{p} {summary[f'p{p}'] * 1e6:7.1f}" for p in PERCENTILES)
+              + f"  max {summary['max'] * 1e6:8.1f}")
+    print(f"  fila esvaziada {drain * 1e3:.1f} ms depois do fim, {writer.written} gravados em {files} arquivos, "
+          f"{writer.dropped} descartados")
+
+
+def env_rate(args):
+    import numpy as np
+    from env import SnakeEnv, VecEnv
+    rng = np.random.default_rng(0)
+    envs = [SnakeEnv(seed=i, seed_stride=args.envs) for i in range(args.envs)]
+    for env in envs:
+        env.reset()
+    start = time.perf_counter()
+    for _ in range(args.steps):
+        for env, action in zip(envs, rng.integers(4, size=args.envs)):
+            if env.step(action)[2]:
+                env.reset()
+    serial = args.envs * args.steps / (time.perf_counter() - start)
+    print(f"{args.envs} ambientes, {args.steps} passos cada ({os.cpu_count()} nucleos)")
+    print(f"  SnakeEnv em sequencia: {serial:9.0f} passos/s")
+    for workers in args.workers:
+        with VecEnv(args.envs, workers=workers) as vec:
+            vec.reset()
+            start = time.perf_counter()
+            for _ in range(args.steps):
+                vec.step(rng.integers(4, size=args.envs))
+            rate = args.envs * args.steps / (time.perf_counter() - start)
+        print(f"  VecEnv, {workers:2} processos:  {rate:9.0f} passos/s")
+
+
+class LatencySimulation(Simulation):
+    # records, at each move that takes a queued turn, how many ticks the turn waited
+    def __init__(self, *args, **kwargs):
+        self.turn_latency = []
+        super().__init__(*args, **kwargs)
+
+    def step_snake(self):
+        if self.snake.turns:
+            self.turn_latency.append(self.ticks - self.snake.turns[0][1])
+        super().step_snake()
+
+
+def input_latency(args):
+    # a player turning at random moments, sometimes twice inside one snake move (up
+    # then left). The queue takes every valid turn; the old input handling dropped a
+    # press within 50 ms of the last one and let a second press replace the first
+    rng = random.Random(0)
+    debounce = round(0.05 / TICK)
+    sim = LatencySimulation(seed=0)
+    presses = queued = old_taken = 0
+    latency = []
+    last_press = -debounce - 1
+    while presses < args.presses:
+        if sim.over:
+            latency += sim.turn_latency
+            sim = LatencySimulation(seed=presses)
+            last_press = -debounce - 1
+        start = sim.ticks
+        window = sim.snake_interval - sim.snake_timer
+        moments = sorted(rng.randrange(window) for _ in range(2 if rng.random() < args.doubles else 1))
+        old_window = []
+        for moment in moments:
+            sim.run(start + moment - sim.ticks)
+            if sim.over:
+                break
+            # always a right angle to the way the snake will be heading
+            heading = sim.snake.turns[-1][0] if sim.snake.turns else sim.snake.direction
+            turn = rng.choice([(heading[1], heading[0]), (-heading[1], -heading[0])])
+            presses += 1
+            queued += sim.change_direction(turn)
+            if sim.ticks - last_press > debounce:
+                last_press = sim.ticks
+                old_window.append(turn)
+        old_taken += min(1, len(old_window))
+        sim.run(start + window - sim.ticks)
+        sim.run(rng.randrange(args.gap) * sim.snake_interval)
+    latency += sim.turn_latency
+    ordered = sorted(latency)
+    p50, p99 = percentile(ordered, 50), percentile(ordered, 99)
+    print(f"{presses} curvas, {args.doubles:.0%} em pares dentro de um movimento")
+    print(f"  fila:          {queued:6} feitas ({queued / presses:.1%}), latencia p50 {p50} p99 {p99} "
+          f"max {ordered[-1]} ticks (movimento a cada {sim.snake_interval})")
+    print(f"  debounce 50ms: {old_taken:6} feitas ({old_taken / presses:.1%})")
+
+
+async def bot(host, port, seconds, seed, stats):
+    import asyncio
+    from protocol import JOIN, TURN, ClientState, frame, read_message
+    rng = random.Random(seed)
+    reader, writer = await asyncio.open_connection(host, port)
+    writer.write(frame(JOIN + f"bot{seed}".encode()))
+    loop = asyncio.get_running_loop()
+    state = ClientState()
+    received = 0
+    arrivals = []
+    start = loop.time()
+    try:
+        while loop.time() - start < seconds:
+            message = await read_message(reader)
+            now = loop.time()
+            received += len(message) + 4
+            state.handle(message)
+            if state.sent:
+                stats["latency"].append(now - state.sent)
+                arrivals.append(now)
+            if rng.random() < 0.2:
+                writer.write(frame(TURN + bytes((rng.randrange(4),))))
+    except (asyncio.IncompleteReadError, ConnectionError):
+        stats["dropped"] += 1
+    elapsed = loop.time() - start
+    writer.close()
+    stats["rates"].append(received / elapsed)
+    stats["gaps"].extend(b - a for a, b in zip(arrivals, arrivals[1:]))
+
+
+def server_load(args):
+    # the server in its own process, every bot in this one on asyncio
+    import asyncio
+    command = [sys.executable, "server.py", "--port", str(args.port), "--seed", "0",
+               "--seconds", str(args.seconds + 2)]
+    if args.world:
+        command += ["--world", args.world]
+    server = subprocess.Popen(command, stdout=subprocess.PIPE, text=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__)))
+    stats = {"latency": [], "gaps": [], "rates": [], "dropped": 0}
+
+    async def swarm():
+        for _ in range(50):
+            try:
+                _, writer = await asyncio.open_connection("127.0.0.1", args.port)
+                writer.close()
+                break
+            except OSError:
+                await asyncio.sleep(0.1)
+        await asyncio.gather(*(bot("127.0.0.1", args.port, args.seconds, i, stats) for i in range(args.bots)))
+
+    asyncio.run(swarm())
+    output = server.communicate()[0].strip()
+    latency = summarize(stats["latency"])
+    gaps = summarize(stats["gaps"])
+    print(f"{args.bots} bots por {args.seconds:.0f}s ({os.cpu_count()} nucleos, tudo nesta maquina)")
+    print(f"  servidor: {output}")
+    print(f"  atraso do snapshot: p50 {latency['p50'] * 1e3:.2f} ms  p99 {latency['p99'] * 1e3:.2f} ms  "
+          f"max {latency['max'] * 1e3:.2f} ms")
+    print(f"  intervalo entre snapshots: p50 {gaps['p50'] * 1e3:.1f} ms  p99 {gaps['p99'] * 1e3:.1f} ms")
+    print(f"  banda por cliente: {statistics.fmean(stats['rates']) / 1024:.2f} KB/s em media, "
+          f"{max(stats['rates']) / 1024:.2f} KB/s no maximo; {stats['dropped']} desconectados")
+
+
+def snapshot(args):
+    import copy
+    sim = Simulation(seed=0, vectorized=args.numpy)
+    build_snake(sim, args.length)
+    sim.set_enemies([])
+    while len(sim.enemies) < args.enemies:
+        sim.enemies.extend(sim.generate_enemies())
+    sim.bosses = [sim.generate_boss() for _ in range(args.bosses)]
+
+    def timed(action):
+        start = time.perf_counter()
+        for _ in range(args.repeat):
+            action()
+        return (time.perf_counter() - start) / args.repeat
+
+    state = sim.snapshot()
+    take = timed(sim.snapshot)
+    put = timed(lambda: sim.restore(state))
+    deep = timed(lambda: copy.deepcopy(sim))
+    print(f"estado com {args.length} segmentos, {args.enemies} inimigos e {args.bosses} bosses")
+    print(f"  snapshot():      {take * 1e6:9.1f} us")
+    print(f"  restore():       {put * 1e6:9.1f} us")
+    print(f"  copy.deepcopy:   {deep * 1e6:9.1f} us ({deep / (take + put):.0f}x)")
+
+
+def grid_errors(sim):
+    # recounts every layer of the grid from the game state; the layers that disagree
+    from array import array
+    from simulation import DIRECTIONS
+    grid = sim.grid
+    cells = len(grid.snake)
+    snake = bytearray(cells)
+    enemy = array('H', bytes(2 * cells))
+    load = array('i', bytes(4 * cells))
+    for cell in sim.snake.body:
+        snake[cell] += 1
+        load[cell] += 1
+    for entity in sim.food + sim.items:
+        load[grid.cell(entity["pos"])] += 1
+    enemies = list(sim.enemies)
+    for e in enemies:
+        cell = grid.cell(e["pos"])
+        enemy[cell] += 1
+        load[cell] += 1
+    for boss in sim.bosses:
+        for cell in sim.boss_cells(boss):
+            load[cell] += 1
+    errors = []
+    if snake != grid.snake:
+        errors.append("snake")
+    if enemy != grid.enemy:
+        errors.append("enemy")
+    if any(enemy[grid.cell(e["pos"])] == 1 and grid.enemy_dir[grid.cell(e["pos"])] != DIRECTIONS.index(tuple(e["dir"]))
+           for e in enemies):
+        errors.append("enemy_dir")
+    if load != grid.load:
+        errors.append("load")
+    if sorted(grid.free[:grid.free_count]) != [cell for cell in range(cells) if load[cell] == 0]:
+        errors.append("free")
+    if sorted(grid.free) != list(range(cells)) or any(grid.free[grid.where[cell]] != cell for cell in range(cells)):
+        errors.append("where")
+    return errors
+
+
+def check(args):
+    # random games on both enemy backends, then swarms big enough for apply() to take
+    # its whole-board path, with the grid recounted every few moves
+    from simulation import random_policy
+    failed = 0
+    runs = []
+    for game in range(args.games):
+        runs.append((f"partida {game}", Simulation(seed=game, vectorized=bool(game % 2)), random.Random(game)))
+    for enemies in args.enemies:
+        runs.append((f"enxame {enemies}", stress_sim(50, enemies, seed=enemies, vectorized=True), None))
+    for name, sim, policy in runs:
+        checks = 0
+        errors = []
+        moves = 0
+        while not sim.over and sim.ticks < args.max_ticks and not errors:
+            if policy is None:
+                sim.step_enemies()
+            else:
+                random_policy(sim, policy)
+                sim.run(max(1, sim.snake_interval - sim.snake_timer))
+            moves += 1
+            # a swarm moves every enemy at once, so it is checked after every step
+            if policy is None or moves % args.every == 0 or sim.over:
+                errors = grid_errors(sim)
+                checks += 1
+            if policy is None and moves >= args.steps:
+                break
+        failed += bool(errors)
+        if errors:
+            print(f"{name}: DIVERGIU em {', '.join(errors)} no tick {sim.ticks}")
+        elif args.verbose:
+            print(f"{name}: ok, {checks} conferencias")
+    print(f"{len(runs) - failed} de {len(runs)} sem divergencias na grade")
+    sys.exit(1 if failed else 0)
+
+
+def summarize(samples):
+    ordered = sorted(samples)
+    summary = {"n": len(samples), "mean": statistics.fmean(samples), "min": ordered[0], "max": ordered[-1]}
+    for p in PERCENTILES:
+        summary[f"p{p}"] = percentile(ordered, p)
+    return summary
+
+
+def sample(action, count, setup=None):
+    samples = []
+    for _ in range(count):
+        if setup is not None:
+            setup()
+        start = time.perf_counter()
+        action()
+        samples.append(time.perf_counter() - start)
+    return samples
+
+
+def suite_ticks(game, args):
+    # each sample is one snake interval of update_game_logic, reported per tick
+    results = {}
+    for length in args.lengths:
+        for enemies in args.enemies:
+            for bosses in args.bosses:
+                game.sim = stress_sim(length, enemies, bosses)
+                samples = []
+                for _ in range(args.steps):
+                    if game.sim.over:
+                        game.sim = stress_sim(length, enemies, bosses)
+                    sim = game.sim
+                    game.tick_accumulator = 0.0
+                    first = sim.ticks
+                    start = time.perf_counter()
+                    game.update_game_logic(sim.snake_interval * TICK)
+                    elapsed = time.perf_counter() - start
+                    samples.append(elapsed / max(1, sim.ticks - first))
+                results[f"tick/segmentos={length},inimigos={enemies},bosses={bosses}"] = summarize(samples)
+    return results
+
+
+def suite_render(game, args):
+    import cobrinhafix
+    game.sim = Simulation(seed=0)
+    build_snake(game.sim, 200)
+    game.sim.set_enemies([])
+    while len(game.sim.enemies) < 20:
+        game.sim.enemies.extend(game.sim.generate_enemies())
+    game.sim.bosses = [game.sim.generate_boss() for _ in range(2)]
+    game.state = cobrinhafix.JOGO
+
+    def advance():
+        game.sim.run(3)
+        if game.sim.over:
+            game.sim.over = False
+
+    def frame():
+        game.draw_game()
+        game.present()
+
+    results = {"draw_game/dirty": summarize(sample(frame, args.frames, advance))}
+
+    def invalidate():
+        advance()
+        game.renderer.invalidate()
+
+    results["draw_game/completo"] = summarize(sample(frame, args.frames, invalidate))
+    return results
+
+
+def suite_startup(args):
+    modes = ["sync", "async"] + (["cache"] if os.path.exists("assets.cache") else [])
+    results = {}
+    for mode in modes:
+        runs = [run_probe(mode) for _ in range(args.repeat)]
+        results[f"startup/{mode}/primeiro_quadro"] = summarize([run["first_frame"] for run in runs])
+        results[f"startup/{mode}/load_assets"] = summarize([run["all"] for run in runs])
+    return results
+
+
+def suite_leaderboard(args):
+    from leaderboard import Leaderboard
+    with tempfile.TemporaryDirectory() as pasta:
+        caminho = os.path.join(pasta, "score.txt")
+        write_scores(caminho, args.entries)
+        # rewritten before every load, since a load compacts the file
+        results = {"leaderboard/load": summarize(
+            sample(lambda: Leaderboard(caminho), args.repeat, lambda: write_scores(caminho, args.entries)))}
+        board = Leaderboard(caminho)
+        counter = iter(range(10 ** 9))
+        results["leaderboard/add"] = summarize(
+            sample(lambda: board.add("novo", float(next(counter) % 600)), args.saves))
+    return results
+
+
+def suite(args):
+    import pygame
+    game = headless_game()
+    results = {}
+    results.update(suite_ticks(game, args))
+    results.update(suite_render(game, args))
+    pygame.quit()
+    results.update(suite_startup(args))
+    results.update(suite_leaderboard(args))
+
+    report = {
+        "meta": {"python": platform.python_version(), "pygame": pygame.version.ver,
+                 "platform": platform.platform(), "date": time.strftime("%Y-%m-%dT%H:%M:%S")},
+        "unit": "s",
+        "results": results,
+    }
+    with open(args.output, 'w') as f:
+        json.dump(report, f, indent=2)
+    for name, summary in results.items():
+        print(f"{name:55} p50 {summary['p50'] * 1e3:9.3f} ms  p99 {summary['p99'] * 1e3:9.3f} ms")
+    print(f"resultados em {args.output}")
+
+
+def compare(args):
+    with open(args.baseline) as f:
+        baseline = json.load(f)["results"]
+    with open(args.current) as f:
+        current = json.load(f)["results"]
+    regressions = 0
+    for name, summary in current.items():
+        if name not in baseline:
+            print(f"{name:55} novo")
+            continue
+        before = baseline[name][args.metric]
+        after = summary[args.metric]
+        change = after / before - 1 if before else 0.0
+        flag = ""
+        if change > args.threshold:
+            flag = "REGRESSAO"
+            regressions += 1
+        elif change < -args.threshold:
+            flag = "melhora"
+        print(f"{name:55} {before * 1e3:9.3f} -> {after * 1e3:9.3f} ms {change:+7.1%} {flag}")
+    for name in baseline.keys() - current.keys():
+        print(f"{name:55} ausente")
+    print(f"{regressions} regressoes em {args.metric} (limite {args.threshold:.0%})")
+    sys.exit(1 if regressions else 0)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="benchmarks da cobrinha")
+    sub = parser.add_subparsers(dest="modo", required=True)
+
+    p = sub.add_parser("stress", help="tempo por passo com cobra longa e muitos inimigos")
+    p.add_argument("--lengths", type=int, nargs="+", default=[100, 1000, 10000, 20000])
+    p.add_argument("--enemies", type=int, nargs="+", default=[10, 100, 500])
+    p.add_argument("--steps", type=int, default=50)
+    p.set_defaults(func=stress)
+
+    p = sub.add_parser("swarm", help="passo dos inimigos em lista vs EnemySwarm (numpy)")
+    p.add_argument("--enemies", type=int, nargs="+", default=[100, 1000, 10000, 50000])
+    p.add_argument("--length", type=int, default=1000)
+    p.add_argument("--steps", type=int, default=20)
+    p.set_defaults(func=swarm)
+
+    p = sub.add_parser("bosses", help="passo dos bosses com o campo de distancias compartilhado")
+    p.add_argument("--bosses", type=int, nargs="+", default=[1, 10, 100])
+    p.add_argument("--length", type=int, default=30)
+    p.add_argument("--steps", type=int, default=10)  # few enough that no boss reaches the snake
+    p.set_defaults(func=bosses)
+
+    p = sub.add_parser("body", help="memoria e custo do corpo em ring buffer vs lista")
+    p.add_argument("--length", type=int, default=100000)
+    p.add_argument("--steps", type=int, default=1000)
+    p.set_defaults(func=body_memory)
+
+    p = sub.add_parser("render", help="tempo de quadro do draw_game no driver dummy")
+    p.add_argument("--length", type=int, default=500)
+    p.add_argument("--enemies", type=int, default=50)
+    p.add_argument("--bosses", type=int, default=5)
+    p.add_argument("--frames", type=int, default=300)
+    p.set_defaults(func=render)
+
+    p = sub.add_parser("world", help="tempo de quadro com camera em mundos de tamanhos diferentes")
+    p.add_argument("--sizes", type=int, nargs="+", default=[60, 250, 1000])
+    p.add_argument("--density", type=float, default=0.02)  # inimigos por celula
+    p.add_argument("--length", type=int, default=200)
+    p.add_argument("--bosses", type=int, default=5)
+    p.add_argument("--frames", type=int, default=300)
+    p.set_defaults(func=world)
+
+    p = sub.add_parser("spawn", help="custo de achar uma celula livre com o tabuleiro cheio")
+    p.add_argument("--fills", type=float, nargs="+", default=[0.0, 0.5, 0.9, 0.99, 0.999])
+    p.add_argument("--spawns", type=int, default=20000)
+    p.set_defaults(func=spawn)
+
+    p = sub.add_parser("idle", help="uso de CPU com o jogo parado no menu")
+    p.add_argument("--seconds", type=float, default=3.0)
+    p.set_defaults(func=idle)
+
+    p = sub.add_parser("startup", help="tempo ate o primeiro quadro, carga sequencial vs paralela")
+    p.add_argument("--repeat", type=int, default=5)
+    p.add_argument("--probe", choices=["sync", "async", "cache"], help=argparse.SUPPRESS)
+    p.set_defaults(func=startup)
+
+    p = sub.add_parser("images", help="decodificacao de PNG vs cache pre-escalado")
+    p.set_defaults(func=image_load)
+
+    p = sub.add_parser("music", help="memoria das musicas carregadas como Sound vs streaming")
+    p.add_argument("--probe", choices=["sound", "music"], help=argparse.SUPPRESS)
+    p.set_defaults(func=music_memory)
+
+    p = sub.add_parser("audio", help="efeitos com Sound.play() vs ChannelManager em jogo pesado")
+    p.add_argument("--seconds", type=float, default=3.0)
+    p.add_argument("--deaths", type=int, default=30)
+    p.add_argument("--buffer", type=int, default=512)
+    p.set_defaults(func=audio_load)
+
+    p = sub.add_parser("leaderboard", help="carga e gravacao do placar")
+    p.add_argument("--entries", type=int, default=1000000)
+    p.add_argument("--saves", type=int, default=200)
+    p.set_defaults(func=leaderboard)
+
+    p = sub.add_parser("telemetry", help="custo de registrar eventos: escrita direta vs fila com thread")
+    p.add_argument("--events", type=int, default=20000)
+    p.add_argument("--rotate", type=int, default=1 << 18)
+    p.set_defaults(func=telemetry_load)
+
+    p = sub.add_parser("env", help="passos/s do SnakeEnv em sequencia vs VecEnv")
+    p.add_argument("--envs", type=int, default=16)
+    p.add_argument("--steps", type=int, default=500)
+    p.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4])
+    p.set_defaults(func=env_rate)
+
+    p = sub.add_parser("input", help="latencia em ticks das curvas na fila vs o debounce antigo")
+    p.add_argument("--presses", type=int, default=20000)
+    p.add_argument("--doubles", type=float, default=0.3)  # fracao das vezes com duas curvas seguidas
+    p.add_argument("--gap", type=int, default=4)  # movimentos sem curva entre uma e outra, no maximo
+    p.set_defaults(func=input_latency)
+
+    p = sub.add_parser("server", help="carga no servidor multijogador com bots locais")
+    p.add_argument("--bots", type=int, default=100)
+    p.add_argument("--seconds", type=float, default=10.0)
+    p.add_argument("--port", type=int, default=5599)
+    p.add_argument("--world", metavar="COLUNASxLINHAS", default="100x80")
+    p.set_defaults(func=server_load)
+
+    p = sub.add_parser("snapshot", help="snapshot/restore do estado vs copy.deepcopy")
+    p.add_argument("--length", type=int, default=200)
+    p.add_argument("--enemies", type=int, default=20)
+    p.add_argument("--bosses", type=int, default=2)
+    p.add_argument("--repeat", type=int, default=2000)
+    p.add_argument("--numpy", action="store_true", help="inimigos no EnemySwarm")
+    p.set_defaults(func=snapshot)
+
+    p = sub.add_parser("check", help="confere contadores e lista de livres da grade em partidas aleatorias")
+    p.add_argument("--games", type=int, default=80)
+    p.add_argument("--enemies", type=int, nargs="+", default=[500, 3000])
+    p.add_argument("--steps", type=int, default=100)  # passos de cada enxame
+    p.add_argument("--every", type=int, default=25)  # movimentos entre conferencias
+    p.add_argument("--max-ticks", type=int, default=100000)
+    p.add_argument("--verbose", action="store_true")
+    p.set_defaults(func=check)
+
+    p = sub.add_parser("suite", help="todas as medidas com percentis, gravadas em JSON")
+    p.add_argument("--output", default="benchmark.json")
+    p.add_argument("--lengths", type=int, nargs="+", default=[10, 1000, 10000])
+    p.add_argument("--enemies", type=int, nargs="+", default=[10, 500])
+    p.add_argument("--bosses", type=int, nargs="+", default=[0, 10])
+    p.add_argument("--steps", type=int, default=100)
+    p.add_argument("--frames", type=int, default=300)
+    p.add_argument("--repeat", type=int, default=5)
+    p.add_argument("--entries", type=int, default=100000)
+    p.add_argument("--saves", type=int, default=200)
+    p.set_defaults(func=suite)
+
+    p = sub.add_parser("compare", help="compara um JSON do suite com uma linha de base")
+    p.add_argument("baseline")
+    p.add_argument("current")
+    p.add_argument("--metric", default="p50", choices=["mean", "min"] + [f"p{p}" for p in PERCENTILES])
+    p.add_argument("--threshold", type=float, default=0.20)
+    p.set_defaults(func=compare)
+
+    args = parser.parse_args()
+    args.func(args)
@@ -0,0 +1,67 @@
+from array import array
+
+
+class SnakeBody:
+    # ring buffer of packed cell indices, head first; capacity doubles when full
+    def __init__(self, capacity=64):
+        self.cells = array('i', bytes(4 * capacity))
+        self.mask = capacity - 1
+        self.start = 0
+        self.size = 0
+
+    def __len__(self):
+        return self.size
+
+    def __iter__(self):
+        view = memoryview(self.cells)
+        first = self.start
+        last = first + self.size
+        capacity = len(self.cells)
+        if last <= capacity:
+            yield from view[first:last]
+        else:
+            yield from view[first:]
+            yield from view[:last - capacity]
+
+    def head(self):
+        return self.cells[self.start]
+
+    def tail(self):
+        return self.cells[(self.start + self.size - 1) & self.mask]
+
+    def push_head(self, cell):
+        if self.size == len(self.cells):
+            self._grow_capacity()
+        self.start = (self.start - 1) & self.mask
+        self.cells[self.start] = cell
+        self.size += 1
+
+    def push_tail(self, cell):
+        if self.size == len(self.cells):
+            self._grow_capacity()
+        self.cells[(self.start + self.size) & self.mask] = cell
+        self.size += 1
+
+    def pop_tail(self):
+        if not self.size:
+            raise IndexError("pop from empty snake body")
+        self.size -= 1
+        return self.cells[(self.start + self.size) & self.mask]
+
+    def snapshot(self):
+        return (self.cells.tobytes(), self.start, self.size)
+
+    def restore(self, state):
+        cells, self.start, self.size = state
+        if len(cells) != 4 * len(self.cells):
+            self.cells = array('i', bytes(len(cells)))
+            self.mask = len(self.cells) - 1
+        memoryview(self.cells).cast('B')[:] = cells
+
+    def _grow_capacity(self):
+        # only called when full, so the ring is exactly cells[start:] + cells[:start]
+        cells = self.cells[self.start:] + self.cells[:self.start]
+        cells.extend(array('i', bytes(4 * len(cells))))
+        self.cells = cells
+        self.mask = len(cells) - 1
+        self.start = 0
@@ -0,0 +1,128 @@
+import socket
+
+import pygame
+
+from assets import ASSETS, AssetLoader
+from protocol import JOIN, TURN, ClientState, frame, split_frames
+from render import TextCache
+from simulation import BLOCK_SIZE, DIRECTIONS, HEIGHT, WIDTH
+from server import PORT
+
+KEYS = {
+    pygame.K_UP: 0, pygame.K_w: 0,
+    pygame.K_DOWN: 1, pygame.K_s: 1,
+    pygame.K_LEFT: 2, pygame.K_a: 2,
+    pygame.K_RIGHT: 3, pygame.K_d: 3,
+}
+OTHER_SNAKE = (230, 120, 40)
+
+
+class Connection:
+    # non-blocking socket to the server, read once per frame; no threads
+    def __init__(self, host, port, name):
+        self.sock = socket.create_connection((host, port))
+        self.sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        self.sock.sendall(frame(JOIN + name.encode("utf-8")))
+        self.sock.setblocking(False)
+        self.buffer = bytearray()
+        self.closed = False
+
+    def send_turn(self, code):
+        self.sock.send(frame(TURN + bytes((code,))))
+
+    def poll(self):
+        while True:
+            try:
+                data = self.sock.recv(1 << 16)
+            except BlockingIOError:
+                break
+            if not data:
+                self.closed = True
+                break
+            self.buffer += data
+        return split_frames(self.buffer)
+
+
+class Client:
+    # draws whatever the server last sent, with the view centred on our own head;
+    # the game rules all run on the server
+    def __init__(self, host, port, name):
+        pygame.init()
+        self.connection = Connection(host, port, name)
+        self.state = ClientState()
+        self.screen = pygame.display.set_mode((WIDTH, HEIGHT))
+        pygame.display.set_caption("Snake - multijogador")
+        self.clock = pygame.time.Clock()
+        self.text = TextCache()
+        loader = AssetLoader([a for a in ASSETS if a[0] == "game" and a[1] in ("image", "rotations")])
+        loader.wait()
+        self.images = loader.images
+        self.background = self.images["game_background"].convert()
+
+    def run(self):
+        while not self.connection.closed:
+            for event in pygame.event.get():
+                if event.type == pygame.QUIT:
+                    return
+                if event.type == pygame.KEYDOWN and event.key in KEYS:
+                    self.connection.send_turn(KEYS[event.key])
+            for message in self.connection.poll():
+                self.state.handle(message)
+            self.draw()
+            pygame.display.flip()
+            self.clock.tick(60)
+
+    def draw(self):
+        state = self.state
+        screen = self.screen
+        images = self.images
+        cols = state.cols or 1
+        width, height = state.cols * BLOCK_SIZE, state.rows * BLOCK_SIZE
+        mine = state.snakes.get(state.player_id)
+        left = top = 0
+        if mine is not None and mine[0]:
+            head = mine[0][0]
+            left = max(0, min(head % cols * BLOCK_SIZE - WIDTH // 2, width - WIDTH))
+            top = max(0, min(head // cols * BLOCK_SIZE - HEIGHT // 2, height - HEIGHT))
+
+        def at(cell):
+            return (cell % cols * BLOCK_SIZE - left, cell // cols * BLOCK_SIZE - top)
+
+        screen.fill((0, 0, 0))
+        bw, bh = self.background.get_size()
+        for x in range(-(left % bw), min(WIDTH, width - left), bw):
+            for y in range(-(top % bh), min(HEIGHT, height - top), bh):
+                screen.blit(self.background, (x, y))
+        for player_id, (body, direction, score) in state.snakes.items():
+            for cell in list(body)[1:]:
+                if player_id == state.player_id:
+                    screen.blit(images["snake_body"], at(cell))
+                else:
+                    screen.fill(OTHER_SNAKE, pygame.Rect(at(cell), (BLOCK_SIZE, BLOCK_SIZE)))
+            if body:
+                screen.blit(images["snake_head"][DIRECTIONS[direction]], at(body[0]))
+        for cell, bonus in state.food:
+            screen.blit(images["food"][bonus], at(cell))
+        for cell, _ in state.items:
+            screen.blit(images["item"], at(cell))
+        for cell, direction in state.enemies:
+            screen.blit(images["enemy"][DIRECTIONS[direction]], at(cell))
+        for cell, direction in state.bosses:
+            screen.blit(images["boss"][DIRECTIONS[direction]], at(cell))
+
+        ranking = sorted(((snake[2], player_id) for player_id, snake in state.snakes.items()), reverse=True)
+        for i, (score, player_id) in enumerate(ranking[:5]):
+            color = (255, 255, 0) if player_id == state.player_id else (255, 255, 255)
+            screen.blit(self.text.render(f"Jogador {player_id}: {score}", 24, color), (10, 10 + 20 * i))
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="cliente multijogador da cobrinha")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=PORT)
+    parser.add_argument("--name", default="")
+    args = parser.parse_args()
+
+    Client(args.host, args.port, args.name).run()
@@ -1,168 +1,133 @@
+import atexit
+import os
 import pygame
 import sys
-import random
 import time
-import os
+
+import audio
+from assets import ASSET_WORKERS, CACHE_FILE, AssetLoader
+from leaderboard import Leaderboard
+from profiler import PHASES, FrameProfiler
+from render import PlayfieldRenderer, TextCache, WorldRenderer
+from replay import save_replay
+from simulation import (WIDTH, HEIGHT, BLOCK_SIZE, TICK, EAT, GAME_OVER, ITEM, LEVEL_UP, Simulation)
+from telemetry import TelemetryWriter
 
 # constantes
 
+LOADING = "loading"
 MENU = "menu"
 JOGO = "jogo"
 SCORE = "score"
 HOW_TO_PLAY = "how_to_play"
-WIDTH, HEIGHT = 1000, 800
-BLOCK_SIZE = 20
 INFO_WIDTH = 150
-SNAKE_SPEED = 1
-SNAKE_UPDATE_INTERVAL = 0.1  # seconds
-ENEMY_UPDATE_INTERVAL = 0.5  # seconds
-BOSS_UPDATE_INTERVAL = 0.2  # seconds
-scores = []
+FPS = 60  # frame cap; the simulation runs at 1 / TICK whatever it is
+MAX_FRAME_TIME = 0.25  # seconds of catch-up per frame at most, so a stall can't snowball
+IDLE_TIMEOUT_MS = 500
+LOADING_POLL_MS = 50
+PROFILE_PANEL_TOP = 80  # profiler overlay, below the HUD lines in the side panel
+SPIKE_FRAMES = 2  # a gameplay frame longer than this many frame budgets goes to the telemetry
+# what the info of an event is called in the telemetry
+TELEMETRY_FIELDS = {EAT: "bonus", ITEM: "type", LEVEL_UP: "level"}
 VOLUME_INCREMENT = 0.1
 MAX_VOLUME = 1.0
 MIN_VOLUME = 0.0
 
 
 # func
-def carregar_scores():
-    if os.path.exists('score.txt'):
-        with open('score.txt', 'r') as f:
-            for linha in f:
-                nome, score = linha.strip().split(',')
-                scores.append((nome, float(score)))
-        scores.sort(key=lambda x: x[1], reverse=True)
-
-
 def is_valid_character(char):
     return char.isalnum() or char in " _-"
 
 
-def salvar_score(nome, score):
-    with open('score.txt', 'a') as f:
-        f.write(f"{nome},{score}\n")
-
-
-def carregar_som(caminho):
-    try:
-        return pygame.mixer.Sound(caminho)
-    except pygame.error as e:
-        print(f"Erro no som: {e}")
-        return None
-
-
-class Snake:
-    def __init__(self, x, y):
-        self.head = (x, y)
-        self.body = [(x, y)]
-        self.direction = (0, -1)
-        self.speed = SNAKE_SPEED
-        self.grow = 0
-        self.name = ""
-        self.buffered_direction = self.direction
-
-    def move(self):
-        self.apply_buffered_direction()
-        new_head = (self.head[0] + self.direction[0] * BLOCK_SIZE * self.speed,
-                    self.head[1] + self.direction[1] * BLOCK_SIZE * self.speed)
-
-        if new_head[0] < 0:
-            new_head = (WIDTH - BLOCK_SIZE, new_head[1])
-        elif new_head[0] >= WIDTH:
-            new_head = (0, new_head[1])
-        elif new_head[1] < 0:
-            new_head = (new_head[0], HEIGHT - BLOCK_SIZE)
-        elif new_head[1] >= HEIGHT:
-            new_head = (new_head[0], 0)
-
-        self.head = new_head
-        self.body.insert(0, self.head)
-
-        if self.grow > 0:
-            self.grow -= 1
-        else:
-            self.body.pop()
-
-        return new_head
-
-    def change_direction(self, direction):
-        if direction[0] != -self.direction[0] and direction[1] != -self.direction[1]:
-            self.direction = direction
-            self.buffered_direction = direction
-
-    def apply_buffered_direction(self):
-        if self.head[0] % BLOCK_SIZE == 0 and self.head[1] % BLOCK_SIZE == 0:
-            self.direction = self.buffered_direction
-
-    def grow_snake(self, segments):
-        self.grow += segments
-
-    def check_collision(self):
-        if self.head in self.body[1:]:
-            return True
-        return False
-
-
 class Game:
-    def __init__(self):
+    def __init__(self, asset_workers=ASSET_WORKERS, asset_cache=CACHE_FILE, record_dir=None, profile=None,
+                 fps=FPS, world=None, audio_buffer=audio.MIXER_BUFFER, telemetry=None):
+        audio.pre_init(audio_buffer)
         pygame.init()
         self.screen = pygame.display.set_mode((WIDTH + INFO_WIDTH, HEIGHT))
         pygame.display.set_caption("Snake")
         self.clock = pygame.time.Clock()
-        self.font_large = pygame.font.Font(None, 74)
-        self.font_medium = pygame.font.Font(None, 50)
-        self.font_small = pygame.font.Font(None, 24)
+        self.fps = fps
+        # (cols, rows) of a board bigger than the window, seen through a camera
+        self.world = world
+        self.text = TextCache()
+        self.font_large = self.text.font(74)
+        self.font_medium = self.text.font(50)
+        self.font_small = self.text.font(24)
         self.volume = 1.0
         self.is_muted = False
         self.selected_menu_option = 0
-        self.load_assets()
-        self.set_volume(self.volume)
+        self.needs_redraw = True
+        self.last_state = None
+        self.loader = AssetLoader(workers=asset_workers, cache=asset_cache)
+        self.images = self.loader.images
+        self.sounds = self.loader.sounds
+        self.music = self.loader.music
+        self.audio = audio.ChannelManager(self.sounds)
+        self.renderer = None
+        self.leaderboard = Leaderboard()
+        self.record_dir = record_dir  # finished games are saved there as replays
+        self.dirty_rects = None
+        self.profiler = FrameProfiler(1 / fps)
+        if profile:
+            self.profiler.enabled = True
+            atexit.register(self.profiler.dump, profile)
+        # game events are logged there by a background thread; see telemetry.py
+        self.telemetry = None
+        if telemetry:
+            self.telemetry = TelemetryWriter(telemetry)
+            self.telemetry.record("session", session=self.telemetry.session, fps=fps, world=world)
+            atexit.register(self.telemetry.close)
         self.reset()
-        self.snake_timer = 0
-        self.enemy_timer = 0
-        self.boss_timer = 0
-        self.last_direction_change_time = 0
+        self.wait_for_assets("menu", self.open_menu)
 
     def load_assets(self):
+        self.loader.wait()
+        self.set_volume(self.volume)
 
-        self.images = {
-            "snake_head": pygame.transform.scale(pygame.image.load('cobra.png'), (BLOCK_SIZE, BLOCK_SIZE)),
-            "snake_body": pygame.transform.scale(pygame.image.load('body.png'), (BLOCK_SIZE, BLOCK_SIZE)),
-            "food": {
-                0: pygame.transform.scale(pygame.image.load('maca.png'), (BLOCK_SIZE, BLOCK_SIZE)),
-                1: pygame.transform.scale(pygame.image.load('laranja.png'), (BLOCK_SIZE, BLOCK_SIZE)),
-                2: pygame.transform.scale(pygame.image.load('pera.png'), (BLOCK_SIZE, BLOCK_SIZE)),
-                3: pygame.transform.scale(pygame.image.load('uva.png'), (BLOCK_SIZE, BLOCK_SIZE)),
-            },
-            "item": pygame.transform.scale(pygame.image.load('item.png'), (BLOCK_SIZE, BLOCK_SIZE)),
-            "enemy": pygame.transform.scale(pygame.image.load('inimigo.png'), (BLOCK_SIZE, BLOCK_SIZE)),
-            "boss": pygame.transform.scale(pygame.image.load('boss.png'), (BLOCK_SIZE * 2, BLOCK_SIZE * 2)),
-            "menu_background": pygame.image.load('menu.png'),
-            "score_background": pygame.image.load('score.png'),
-            "game_background": pygame.image.load('game.png'),
-            "how_image": pygame.image.load('tutorial.png')
-        }
-        self.sounds = {
-            "eat": carregar_som('eat.wav'),
-            "enemy": carregar_som('inimigo.wav'),
-            "game_over": carregar_som('go.wav'),
-            "level_up": carregar_som('nvl.wav'),
-            "boss": carregar_som('boss.wav'),
-            "item": carregar_som('item.wav'),
-            "enemy_death": carregar_som('inimigo_death.wav'),
-            "game_sound": carregar_som('game.wav'),
-            "menu_sound": carregar_som('menu.wav'),
-            "score_sound": carregar_som('score.wav'),
-            "boss_death": carregar_som('boss_death.wav')
-        }
+    def poll_assets(self):
+        if not self.loader.done() and self.loader.poll():
+            self.set_volume(self.volume)
 
-        self.set_volume(self.volume)
+    def wait_for_assets(self, group, action):
+        # run action now if its assets are in, otherwise show the loading screen until they are
+        if self.loader.ready(group):
+            self.set_volume(self.volume)
+            action()
+        else:
+            self.loading_group = group
+            self.loading_next = action
+            self.state = LOADING
+
+    def open_menu(self):
+        self.state = MENU
+        self.stop_all_sounds()
+        self.play_sound("menu_sound", loop=True)
+
+    def start_game(self):
+        self.reset()
+        self.state = JOGO
+        self.stop_all_sounds()
+        self.play_sound("game_sound", loop=True)
+        # the time spent asleep on the menu is not game time
+        self.clock.tick()
+        if self.telemetry is not None:
+            self.telemetry.record("start", seed=self.sim.seed)
+
+    def open_scores(self):
+        self.state = SCORE
+        self.stop_all_sounds()
+        self.play_sound("score_sound", loop=True)
+
+    def open_how_to_play(self):
+        self.state = HOW_TO_PLAY
 
     def set_volume(self, volume):
         self.volume = volume
+        self.needs_redraw = True
         pygame.mixer.music.set_volume(self.volume)
         self.is_muted = (self.volume == 0.0)
-        for sound in self.sounds.values():
-            sound.set_volume(self.volume)
+        self.audio.set_volume(self.volume)
 
     def toggle_mute(self):
         if self.is_muted:
@@ -172,84 +137,37 @@ class Game:
             self.set_volume(0.0)
 
     def play_sound(self, sound_name, loop=False):
-        sound = self.sounds[sound_name]
-        if loop:
-            sound.play(loops=-1)
-        else:
-            sound.play()
+        if sound_name in self.music:
+            try:
+                pygame.mixer.music.load(self.music[sound_name])
+                pygame.mixer.music.play(-1 if loop else 0)
+            except pygame.error as e:
+                print(f"Erro no som: {e}")
+            return
+        # effects go out on the next audio.flush(), once per frame
+        self.audio.play(sound_name, loop)
 
     def stop_sound(self, sound_name):
-        self.sounds[sound_name].stop()
+        if sound_name in self.music:
+            pygame.mixer.music.stop()
+        else:
+            self.audio.stop(sound_name)
 
     def stop_all_sounds(self):
-        for sound in self.sounds.values():
-            sound.stop()
+        pygame.mixer.music.stop()
+        self.audio.stop_all()
 
     def reset(self):
-        self.snake = Snake(WIDTH // 2, HEIGHT // 2)
-        self.food = self.generate_food()
-        self.items = self.generate_item()
-        self.enemies = self.generate_enemies()
-        self.bosses = []
+        if self.world:
+            self.sim = Simulation(self.world[0] * BLOCK_SIZE, self.world[1] * BLOCK_SIZE)
+        else:
+            self.sim = Simulation()
+        self.tick_accumulator = 0.0
+        self.peak_enemies = 0
         self.state = MENU
-        self.level = 1
-        self.food_collected = 0
-        self.start_time = time.time()
-        self.elapsed_time = 0
-        self.score = 0
-        carregar_scores()
-
-    @staticmethod
-    def generate_food():
-        food_count = random.randint(1, 4)
-        food = []
-        for _ in range(food_count):
-            pos = (random.randint(0, (WIDTH // BLOCK_SIZE) - 1) * BLOCK_SIZE,
-                   random.randint(0, (HEIGHT // BLOCK_SIZE) - 1) * BLOCK_SIZE)
-            bonus = random.randint(0, 3)
-            food.append({"pos": pos, "bonus": bonus})
-        return food
-
-    @staticmethod
-    def generate_item():
-        chance = random.randint(1, 100)
-        item_type = 0 if chance <= 25 else 1 if chance <= 50 else 2 if chance <= 75 else 3 if chance <= 95 else 4
-        pos = (random.randint(0, (WIDTH // BLOCK_SIZE) - 1) * BLOCK_SIZE,
-               random.randint(0, (HEIGHT // BLOCK_SIZE) - 1) * BLOCK_SIZE)
-        return [{"pos": pos, "type": item_type}]
-
-    @staticmethod
-    def generate_enemies():
-        enemy_count = random.randint(1, 5)
-        enemies = []
-        for _ in range(enemy_count):
-            pos = (random.randint(0, (WIDTH // BLOCK_SIZE) - 1) * BLOCK_SIZE,
-                   random.randint(0, (HEIGHT // BLOCK_SIZE) - 1) * BLOCK_SIZE)
-            direction = random.choice([(1, 0), (-1, 0), (0, 1), (0, -1)])
-            enemies.append({"pos": pos, "dir": direction})
-        return enemies
-
-    @staticmethod
-    def generate_boss():
-        pos = (WIDTH // 2 - BLOCK_SIZE, HEIGHT // 2 - BLOCK_SIZE)
-        return {"pos": pos, "dir": (0, -1), "size": BLOCK_SIZE * 2}
-
-    @staticmethod
-    def move_boss(boss, snake_head):
-        delta_x = snake_head[0] - boss["pos"][0]
-        delta_y = snake_head[1] - boss["pos"][1]
-        distance = (delta_x ** 2 + delta_y ** 2) ** 0.5
-        if distance != 0:
-            boss["pos"] = (
-                boss["pos"][0] + int(delta_x / distance * BLOCK_SIZE),
-                boss["pos"][1] + int(delta_y / distance * BLOCK_SIZE)
-            )
-        return boss
 
     def draw_text(self, text, size, color, pos):
-        font = pygame.font.Font(None, size)
-        text_surface = font.render(text, True, color)
-        self.screen.blit(text_surface, pos)
+        self.screen.blit(self.text.render(text, size, color), pos)
 
     def draw_menu(self):
         self.screen.blit(self.images["menu_background"], (0, 0))
@@ -291,46 +209,51 @@ class Game:
             color = (0, 0, 255) if index != self.selected_menu_option else (255, 0, 0)
             self.draw_text(volume_text, 50, color,(400, 518))
 
-        pygame.display.flip()
+    def draw_loading(self):
+        self.screen.fill((0, 0, 0))
+        width = self.screen.get_width()
+        self.draw_text("Carregando...", 50, (255, 255, 255), (width // 2 - 120, HEIGHT // 2 - 60))
+        bar = pygame.Rect(width // 2 - 200, HEIGHT // 2, 400, 24)
+        pygame.draw.rect(self.screen, (255, 255, 255), bar, 2)
+        filled = bar.inflate(-6, -6)
+        filled.width = int(filled.width * self.loader.progress())
+        pygame.draw.rect(self.screen, (0, 200, 0), filled)
 
     def draw_game(self):
-        self.screen.blit(self.images["game_background"], (0, 0))
-
-        # draw snake
-        for i, pos in enumerate(self.snake.body):
-            if i == 0:
-                rotated_image = self.rotate_image(self.images["snake_head"], self.snake.direction)
-                self.screen.blit(rotated_image, pos)
-            else:
-                self.screen.blit(self.images["snake_body"], pos)
-
-        # draw food
-        for f in self.food:
-            self.screen.blit(self.images["food"][f["bonus"]], f["pos"])
-
-        # draw items
-        for item in self.items:
-            self.screen.blit(self.images["item"], item["pos"])
-
-        # draw enemies
-        for enemy in self.enemies:
-            rotated_image = self.rotate_image(self.images["enemy"], enemy["dir"])
-            self.screen.blit(rotated_image, enemy["pos"])
-
-        # draw boss
-        for boss in self.bosses:
-            rotated_image = self.rotate_image(self.images["boss"], boss["dir"])
-            self.screen.blit(rotated_image, boss["pos"])
-
-        # draw info
-        info_rect = pygame.Rect(WIDTH, 0, INFO_WIDTH, HEIGHT)
-        pygame.draw.rect(self.screen, (50, 50, 50), info_rect)
-
-        self.draw_text(f"Tempo: {self.elapsed_time:.1f}s", 24, (255, 255, 255), (WIDTH + 10, 10))
-        self.draw_text(f"Pontuação: {self.score:.2f}", 24, (255, 255, 255), (WIDTH + 10, 30))
-        self.draw_text(f"Comidas: {self.food_collected}", 24, (255, 255, 255), (WIDTH + 10, 50))
-
-        pygame.display.flip()
+        if self.renderer is None:
+            renderer = WorldRenderer if self.world else PlayfieldRenderer
+            self.renderer = renderer(self.screen, self.images, self.text, INFO_WIDTH)
+        self.dirty_rects = self.renderer.draw(self.sim, self.tick_accumulator / TICK)
+        # the overlay is refreshed every 10 frames, or whenever the HUD cleared the panel
+        if self.profiler.enabled and (self.dirty_rects is None or self.profiler.frames % 10 == 0
+                                      or self.renderer.panel_rect in self.dirty_rects):
+            self.draw_profile()
+
+    def draw_profile(self):
+        panel = self.renderer.panel_rect
+        area = pygame.Rect(panel.left, PROFILE_PANEL_TOP, panel.width, 20 * (len(PHASES) + 3))
+        pygame.draw.rect(self.screen, (50, 50, 50), area)
+        lines = ["ms  p50/p95/p99"]
+        for phase in PHASES + ("frame",):
+            lines.append(f"{phase}: " + "/".join(f"{t * 1e3:.1f}" for t in self.profiler.percentiles(phase)))
+        lines.append(f"perdidos: {self.profiler.dropped}/{self.profiler.frames}")
+        for i, line in enumerate(lines):
+            self.draw_text(line, 20, (255, 255, 0), (area.left + 5, area.top + 20 * i))
+        if self.dirty_rects is not None:
+            self.dirty_rects.append(area)
+
+    def toggle_profiler(self):
+        self.profiler.enabled = not self.profiler.enabled
+        if self.renderer is not None:
+            self.renderer.invalidate()
+
+    def present(self):
+        # the draw_* methods only paint; the frame reaches the display here
+        if self.dirty_rects is None:
+            pygame.display.flip()
+        else:
+            pygame.display.update(self.dirty_rects)
+        self.dirty_rects = None
 
     def draw_how_to_play(self):
         self.screen.blit(self.images["how_image"], (0, 0))
@@ -350,41 +273,33 @@ class Game:
         y = 100
         screen_width = self.screen.get_width()
         for instruction, color in instructions:
-            text_surface = self.font_small.render(instruction, True, color)
+            text_surface = self.text.render(instruction, 24, color)
             text_rect = text_surface.get_rect(center=(screen_width // 2, y))
             self.screen.blit(text_surface, text_rect)
             y += 50
-        pygame.display.flip()
 
     def draw_score(self):
         self.screen.blit(self.images["score_background"], (0, 0))
 
         y_offset = 100
-        for i, (name, score) in enumerate(scores[:10]):
+        for name, score in self.leaderboard.top(10):
             self.draw_text(f"{name} - {score:.2f}", 40, (255, 255, 255), (100, y_offset))
             y_offset += 50
 
         self.draw_text("Digite seu nome:", 50, (255, 255, 255), (100, 650))
-        self.draw_text(self.snake.name, 50, (255, 255, 255), (WIDTH // 4 + 135, 650))
-
-        self.draw_text(f"Score: {self.score}", 50, (255, 255, 255), (WIDTH // 4, HEIGHT // 2 + 300))
-        pygame.display.flip()
-
-    @staticmethod
-    def rotate_image(image, direction):
-        angles = {
-            (0, 1): 0,
-            (0, -1): 180,
-            (1, 0): 90,
-            (-1, 0): -90,
-        }
-        return pygame.transform.rotate(image, angles[direction])
-
-    def handle_events(self):
-        for event in pygame.event.get():
+        self.draw_text(self.sim.snake.name, 50, (255, 255, 255), (WIDTH // 4 + 135, 650))
+
+        self.draw_text(f"Score: {self.sim.score}", 50, (255, 255, 255), (WIDTH // 4, HEIGHT // 2 + 300))
+
+    def handle_events(self, events=None):
+        if events is None:
+            events = pygame.event.get()
+        for event in events:
             if event.type == pygame.QUIT:
                 pygame.quit()
                 sys.exit()
+            elif event.type == pygame.KEYDOWN and event.key == pygame.K_F3:
+                self.toggle_profiler()
             elif event.type == pygame.KEYDOWN:
                 if self.state == MENU:
                     if event.key == pygame.K_DOWN or event.key == pygame.K_s:
@@ -393,16 +308,11 @@ class Game:
                         self.selected_menu_option = (self.selected_menu_option - 1) % 5
                     elif event.key == pygame.K_RETURN:
                         if self.selected_menu_option == 0:
-                            self.reset()
-                            self.state = JOGO
-                            self.stop_all_sounds()
-                            self.play_sound("game_sound", loop=True)
+                            self.wait_for_assets("game", self.start_game)
                         elif self.selected_menu_option == 1:
-                            self.state = SCORE
-                            self.stop_all_sounds()
-                            self.play_sound("score_sound", loop=True)
+                            self.wait_for_assets("score", self.open_scores)
                         elif self.selected_menu_option == 2:
-                            self.state = HOW_TO_PLAY
+                            self.wait_for_assets("how_to_play", self.open_how_to_play)
                         elif self.selected_menu_option == 4:
                             pygame.quit()
                             sys.exit()
@@ -414,44 +324,31 @@ class Game:
                         elif event.key == pygame.K_m:
                             self.toggle_mute()
                 elif self.state == JOGO:
-                    current_time = time.time()
-                    if current_time - self.last_direction_change_time > 0.05:
-                        if event.key == pygame.K_LEFT or event.key == pygame.K_a:
-                            self.snake.change_direction((-1, 0))
-                            self.last_direction_change_time = current_time
-                        elif event.key == pygame.K_RIGHT or event.key == pygame.K_d:
-                            self.snake.change_direction((1, 0))
-                            self.last_direction_change_time = current_time
-                        elif event.key == pygame.K_UP or event.key == pygame.K_w:
-                            self.snake.change_direction((0, -1))
-                            self.last_direction_change_time = current_time
-                        elif event.key == pygame.K_DOWN or event.key == pygame.K_s:
-                            self.snake.change_direction((0, 1))
-                            self.last_direction_change_time = current_time
-                        elif event.key == pygame.K_ESCAPE:
-                            self.state = MENU
-                            self.stop_all_sounds()
-                            self.play_sound("menu_sound", loop=True)
+                    # every key press is queued on the snake, which takes one turn per move
+                    if event.key == pygame.K_LEFT or event.key == pygame.K_a:
+                        self.sim.change_direction((-1, 0))
+                    elif event.key == pygame.K_RIGHT or event.key == pygame.K_d:
+                        self.sim.change_direction((1, 0))
+                    elif event.key == pygame.K_UP or event.key == pygame.K_w:
+                        self.sim.change_direction((0, -1))
+                    elif event.key == pygame.K_DOWN or event.key == pygame.K_s:
+                        self.sim.change_direction((0, 1))
+                    elif event.key == pygame.K_ESCAPE:
+                        self.open_menu()
                 elif self.state == HOW_TO_PLAY:
                     if event.key == pygame.K_ESCAPE:
                         self.state = MENU
                 elif self.state == SCORE:
                     if event.key == pygame.K_RETURN:
-                        salvar_score(self.snake.name, self.score)
-                        scores.append((self.snake.name, self.score))
-                        scores.sort(key=lambda x: x[1], reverse=True)
-                        self.snake.name = " "
-                        self.state = MENU
-                        self.stop_all_sounds()
-                        self.play_sound("menu_sound", loop=True)
+                        self.leaderboard.add(self.sim.snake.name, self.sim.score)
+                        self.sim.snake.name = " "
+                        self.open_menu()
                     elif event.key == pygame.K_BACKSPACE:
-                        self.snake.name = self.snake.name[:-1]
+                        self.sim.snake.name = self.sim.snake.name[:-1]
                     elif is_valid_character(event.unicode):
-                        self.snake.name += event.unicode
+                        self.sim.snake.name += event.unicode
                     elif event.key == pygame.K_ESCAPE:
-                        self.state = MENU
-                        self.stop_all_sounds()
-                        self.play_sound("menu_sound", loop=True)
+                        self.open_menu()
             elif event.type == pygame.MOUSEMOTION:
                 if self.state == MENU:
                     x, y = event.pos
@@ -483,16 +380,11 @@ class Game:
 
                         if event.button == 1:
                             if self.selected_menu_option == 0:
-                                self.reset()
-                                self.state = JOGO
-                                self.stop_all_sounds()
-                                self.play_sound("game_sound", loop=True)
+                                self.wait_for_assets("game", self.start_game)
                             elif self.selected_menu_option == 1:
-                                self.state = SCORE
-                                self.stop_all_sounds()
-                                self.play_sound("score_sound", loop=True)
+                                self.wait_for_assets("score", self.open_scores)
                             elif self.selected_menu_option == 2:
-                                self.state = HOW_TO_PLAY
+                                self.wait_for_assets("how_to_play", self.open_how_to_play)
                             elif self.selected_menu_option == 3:
                                 self.toggle_mute()
                                 self.set_volume(0.0 if self.is_muted else self.volume)
@@ -505,132 +397,136 @@ class Game:
                             self.set_volume(max(self.volume - 0.1, 0.0))
 
     def update_game_logic(self, delta_time):
-        global SNAKE_UPDATE_INTERVAL, ENEMY_UPDATE_INTERVAL, BOSS_UPDATE_INTERVAL
-
-        self.elapsed_time += delta_time
-
-        self.snake_timer += delta_time
-        self.enemy_timer += delta_time
-        self.boss_timer += delta_time
-
-        if self.snake_timer >= SNAKE_UPDATE_INTERVAL:
-            self.snake_timer -= SNAKE_UPDATE_INTERVAL
-            new_head = self.snake.move()
-
-            if self.snake.check_collision():
+        # fixed timestep: all the ticks owed since the last frame run now, in one batch;
+        # whatever is left over is drawn as a fraction of a tick
+        self.tick_accumulator += min(delta_time, MAX_FRAME_TIME)
+        steps = int(self.tick_accumulator / TICK)
+        if steps:
+            self.tick_accumulator -= steps * TICK
+            self.sim.run(steps)
+
+        telemetry = self.telemetry
+        if telemetry is not None:
+            self.peak_enemies = max(self.peak_enemies, len(self.sim.enemies))
+        for kind, info in self.sim.drain_events():
+            if telemetry is not None:
+                self.record_event(kind, info)
+            if kind == GAME_OVER:
+                if self.record_dir:
+                    self.save_replay()
                 self.state = SCORE
                 self.stop_all_sounds()
-                self.sounds["game_over"].play()
+                self.play_sound("game_over")
                 self.play_sound("score_sound", loop=True)
-                return
-
-            # check food collision
-            for food in self.food:
-                if new_head == food["pos"]:
-                    self.snake.grow_snake(food["bonus"] + 1)
-                    self.sounds["eat"].play()
-                    self.food = self.generate_food()
-                    self.food_collected += 1
-                    if self.food_collected % 10 == 0 and self.food_collected != 0:
-                        self.level += 1
-                        SNAKE_UPDATE_INTERVAL = max(0.1, SNAKE_UPDATE_INTERVAL - 0.005)
-                        ENEMY_UPDATE_INTERVAL = max(0.1, ENEMY_UPDATE_INTERVAL - 0.005)
-                        BOSS_UPDATE_INTERVAL = max(0.1, BOSS_UPDATE_INTERVAL - 0.005)
-                        self.sounds["level_up"].play()
-                    if self.food_collected % 15 == 0 and self.food_collected != 0:
-                        self.bosses.append(self.generate_boss())
-                        self.sounds["boss"].play()
-
-            self.score = len(self.snake.body) * self.level - (self.elapsed_time // 2)
-
-            # check item collision
-            for item in self.items:
-                if new_head == item["pos"]:
-                    self.sounds["item"].play()
-                    if item["type"] == 0:
-                        self.snake.grow_snake(5)
-                    elif item["type"] == 1:
-                        self.snake.body = self.snake.body[:-5] if len(self.snake.body) > 5 else [self.snake.body[0]]
-                        if len(self.snake.body) == 1:
-                            self.state = SCORE
-                            self.stop_all_sounds()
-                            self.play_sound("game_over")
-                            self.play_sound("score_sound", loop=True)
-                    elif item["type"] == 2:
-                        self.enemies = self.generate_enemies()
-                        self.sounds["enemy"].play()
-                    elif item["type"] == 3:
-                        self.enemies.extend(self.generate_enemies())
-                    elif item["type"] == 4:
-                        self.bosses.append(self.generate_boss())
-                        self.sounds["boss"].play()
-                    self.items = self.generate_item()
-
-        # move enemies
-        if self.enemy_timer >= SNAKE_UPDATE_INTERVAL:
-            self.enemy_timer -= SNAKE_UPDATE_INTERVAL
-            for enemy in self.enemies:
-                new_enemy_pos = (enemy["pos"][0] + enemy["dir"][0] * BLOCK_SIZE,
-                                 enemy["pos"][1] + enemy["dir"][1] * BLOCK_SIZE)
-
-                if new_enemy_pos[0] < 0:
-                    new_enemy_pos = (WIDTH - BLOCK_SIZE, new_enemy_pos[1])
-                elif new_enemy_pos[0] >= WIDTH:
-                    new_enemy_pos = (0, new_enemy_pos[1])
-                elif new_enemy_pos[1] < 0:
-                    new_enemy_pos = (new_enemy_pos[0], HEIGHT - BLOCK_SIZE)
-                elif new_enemy_pos[1] >= HEIGHT:
-                    new_enemy_pos = (new_enemy_pos[0], 0)
-
-                if new_enemy_pos in self.snake.body:
-                    self.snake.body.pop()
-                    self.sounds["enemy_death"].play()
-                    if len(self.snake.body) == 0:
-                        self.state = SCORE
-                        self.stop_all_sounds()
-                        self.play_sound("game_over")
-                        self.play_sound("score_sound", loop=True)
-                    else:
-                        self.enemies.remove(enemy)
-                else:
-                    enemy["pos"] = new_enemy_pos
-            if not self.enemies:
-                self.enemies = self.generate_enemies()
-
-        # move boss
-        if self.boss_timer >= BOSS_UPDATE_INTERVAL:
-            self.boss_timer -= BOSS_UPDATE_INTERVAL
-            for boss in self.bosses:
-                boss = self.move_boss(boss, self.snake.head)
-                boss_rect = pygame.Rect(boss["pos"], (boss["size"], boss["size"]))
-                snake_rects = [pygame.Rect(pos, (BLOCK_SIZE, BLOCK_SIZE)) for pos in self.snake.body]
-                if any(boss_rect.colliderect(snake_rect) for snake_rect in snake_rects):
-                    self.snake.body = self.snake.body[:-10]
-                    self.sounds["boss_death"].play()
-                    if len(self.snake.body) <= 1:
-                        self.state = SCORE
-                        self.stop_all_sounds()
-                        self.play_sound("game_over")
-                        self.play_sound("score_sound", loop=True)
-                    else:
-                        self.bosses.remove(boss)
-
-    def run(self):
-        self.play_sound("menu_sound", loop=True)
-        while True:
-            delta_time = self.clock.tick(60) / 1000
+            else:
+                self.play_sound(kind)
+
+    def record_event(self, kind, info):
+        sim = self.sim
+        if kind == GAME_OVER:
+            fields = dict(cause=info, score=sim.score, seconds=round(sim.elapsed_time, 3), level=sim.level,
+                          food=sim.food_collected, length=len(sim.snake.body), peak_enemies=self.peak_enemies,
+                          seed=sim.seed)
+        else:
+            field = TELEMETRY_FIELDS.get(kind)
+            fields = {field: info} if field else {}
+        self.telemetry.record(kind, tick=sim.ticks, **fields)
+
+    def save_replay(self):
+        os.makedirs(self.record_dir, exist_ok=True)
+        caminho = os.path.join(self.record_dir, f"partida-{time.strftime('%Y%m%d-%H%M%S')}-{self.sim.seed:016x}.rpl")
+        save_replay(caminho, self.sim)
+        print(f"Replay salvo em {caminho}")
+
+    def wait_for_input(self):
+        # static screens sleep in the event queue instead of redrawing every frame
+        event = pygame.event.wait(IDLE_TIMEOUT_MS if self.loader.done() else LOADING_POLL_MS)
+        if event.type == pygame.NOEVENT:
+            return False
+        self.handle_events([event] + pygame.event.get())
+        return True
+
+    def run_frame(self):
+        delta_time = 0.0
+        self.poll_assets()
+        # only gameplay frames are profiled; the other screens sleep in the event queue
+        profiler = self.profiler if self.profiler.enabled and self.state == JOGO else None
+        if self.state == JOGO:
+            delta_time = self.clock.tick(self.fps) / 1000
+            # start_game restarts the clock, so the wait on the menu never shows up as a spike
+            if self.telemetry is not None and delta_time > SPIKE_FRAMES / self.fps:
+                self.telemetry.record("spike", ms=round(delta_time * 1e3, 1), enemies=len(self.sim.enemies))
+            if profiler:
+                profiler.start()
             self.handle_events()
-            if self.state == MENU:
+            if profiler:
+                profiler.mark("events")
+        elif self.state == LOADING:
+            self.clock.tick(self.fps)
+            self.handle_events()
+            self.needs_redraw = True
+            if self.loader.ready(self.loading_group):
+                self.set_volume(self.volume)
+                self.loading_next()
+        else:
+            self.clock.tick(self.fps)
+            if self.needs_redraw or self.state != self.last_state:
+                self.handle_events()
+            elif self.wait_for_input():
+                self.needs_redraw = True
+
+        if self.state != self.last_state:
+            if self.renderer is not None:
+                self.renderer.invalidate()
+            self.needs_redraw = True
+            self.last_state = self.state
+
+        if self.state == JOGO:
+            self.update_game_logic(delta_time)
+            if profiler:
+                profiler.mark("update")
+            self.draw_game()
+            if profiler:
+                profiler.mark("draw")
+            self.present()
+            if profiler:
+                profiler.mark("flip")
+                profiler.end_frame()
+        elif self.needs_redraw:
+            self.needs_redraw = False
+            if self.state == LOADING:
+                self.draw_loading()
+            elif self.state == MENU:
                 self.draw_menu()
-            elif self.state == JOGO:
-                self.update_game_logic(delta_time)
-                self.draw_game()
             elif self.state == HOW_TO_PLAY:
                 self.draw_how_to_play()
             elif self.state == SCORE:
                 self.draw_score()
+            self.present()
+        self.audio.flush()
+
+    def run(self):
+        while True:
+            self.run_frame()
 
 
 if __name__ == "__main__":
-    game = Game()
+    import argparse
+
+    parser = argparse.ArgumentParser(description="jogo da cobrinha")
+    parser.add_argument("--record", metavar="PASTA", help="grava um replay de cada partida nesta pasta")
+    parser.add_argument("--profile", metavar="ARQUIVO",
+                        help="liga o perfil de quadros (F3) e grava os tempos ao sair, em .csv ou .json")
+    parser.add_argument("--fps", type=int, default=FPS, help="limite de quadros por segundo (ex.: 144)")
+    parser.add_argument("--world", metavar="COLUNASxLINHAS",
+                        help="tabuleiro maior que a janela, com camera (ex.: 1000x1000)")
+    parser.add_argument("--audio-buffer", type=int, default=audio.MIXER_BUFFER,
+                        help="amostras no buffer do mixer; menos e menor atraso, mas pode falhar")
+    parser.add_argument("--telemetry", metavar="PASTA",
+                        help="registra os eventos das partidas nesta pasta (resumo: python telemetry.py PASTA)")
+    args = parser.parse_args()
+
+    world = tuple(int(n) for n in args.world.lower().split("x")) if args.world else None
+    game = Game(record_dir=args.record, profile=args.profile, fps=args.fps, world=world,
+                audio_buffer=args.audio_buffer, telemetry=args.telemetry)
     game.run()
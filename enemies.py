@@ -0,0 +1,78 @@
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+
+class EnemySwarm:
+    # enemies as parallel numpy arrays (column, row, direction) instead of a list of
+    # dicts, so a move is a handful of array operations however many there are.
+    # Iterating still yields {"pos", "dir"} dicts for the renderer
+    def __init__(self, grid):
+        if np is None:
+            raise RuntimeError("EnemySwarm precisa do numpy")
+        self.grid = grid
+        self.clear()
+
+    def clear(self):
+        self.col = np.empty(0, np.intc)
+        self.row = np.empty(0, np.intc)
+        self.dx = np.empty(0, np.intc)
+        self.dy = np.empty(0, np.intc)
+
+    def __len__(self):
+        return len(self.col)
+
+    def __iter__(self):
+        size = self.grid.block_size
+        for col, row, dx, dy in zip(self.col.tolist(), self.row.tolist(), self.dx.tolist(), self.dy.tolist()):
+            yield {"pos": (col * size, row * size), "dir": (dx, dy)}
+
+    def extend(self, enemies):
+        enemies = list(enemies)
+        if not enemies:
+            return
+        size = self.grid.block_size
+        self.col = np.concatenate((self.col, [e["pos"][0] // size for e in enemies])).astype(np.intc)
+        self.row = np.concatenate((self.row, [e["pos"][1] // size for e in enemies])).astype(np.intc)
+        self.dx = np.concatenate((self.dx, [e["dir"][0] for e in enemies])).astype(np.intc)
+        self.dy = np.concatenate((self.dy, [e["dir"][1] for e in enemies])).astype(np.intc)
+
+    def snapshot(self):
+        # moves and spawns build new arrays instead of writing into these, so they can be shared
+        return (self.col, self.row, self.dx, self.dy)
+
+    def restore(self, state):
+        self.col, self.row, self.dx, self.dy = state
+
+    def cells(self):
+        return self.row * self.grid.cols + self.col
+
+    def release(self):
+        if len(self):
+            self.grid.apply(released=self.cells(), enemies=True)
+
+    def targets(self):
+        # next position of every enemy, wrapping around the edges
+        grid = self.grid
+        col = (self.col + self.dx) % grid.cols
+        row = (self.row + self.dy) % grid.rows
+        return col, row, row * grid.cols + col
+
+    def hits(self, cells):
+        # indices of the enemies moving onto the snake, in list order
+        snake = self.grid.views()[0]
+        return np.flatnonzero(snake[cells]).tolist()
+
+    def commit(self, col, row, cells, dead):
+        # move the survivors, drop the dead and update the grid in one batch
+        alive = np.ones(len(self), bool)
+        alive[dead] = False
+        moved = cells[alive]
+        self.grid.apply(occupied=moved, released=self.cells(), enemies=True)
+        # DIRECTIONS index: up, down, left, right
+        self.grid.views()[5][moved] = np.where(self.dx[alive] != 0, 2 + (self.dx[alive] > 0), self.dy[alive] > 0)
+        self.col = col[alive]
+        self.row = row[alive]
+        self.dx = self.dx[alive]
+        self.dy = self.dy[alive]
@@ -0,0 +1,178 @@
+import multiprocessing
+from multiprocessing import shared_memory
+
+import numpy as np
+
+from simulation import BLOCK_SIZE, DIRECTIONS, HEIGHT, WIDTH, Simulation
+
+ACTIONS = DIRECTIONS  # acao i vira DIRECTIONS[i]: cima, baixo, esquerda, direita
+# canais da observacao, uma grade rows x cols de uint8 cada
+BODY, HEAD, FOOD = 0, 1, 2  # FOOD + bonus: um canal por bonus (0-3)
+ITEMS, ENEMIES, BOSSES = 6, 7, 8
+CHANNELS = 9
+DEATH_PENALTY = 10.0
+MAX_TICKS = 200000
+
+
+class SnakeEnv:
+    # gym-style wrapper around Simulation: one step is one snake move. The observation
+    # is a (CHANNELS, rows, cols) uint8 array; the items channel holds type + 1. Each
+    # episode's seed is seed_stride past the last one
+    def __init__(self, width=WIDTH, height=HEIGHT, seed=None, max_ticks=MAX_TICKS, vectorized=False,
+                 seed_stride=1):
+        self.width = width
+        self.height = height
+        self.seed = seed
+        self.seed_stride = seed_stride
+        self.max_ticks = max_ticks
+        self.vectorized = vectorized
+        self.shape = (CHANNELS, height // BLOCK_SIZE, width // BLOCK_SIZE)
+        self.sim = None
+
+    def reset(self, seed=None, out=None):
+        if seed is None and self.seed is not None:
+            # a fixed seed would replay the same game every episode
+            seed = self.seed
+            self.seed += self.seed_stride
+        self.sim = Simulation(self.width, self.height, seed=seed, vectorized=self.vectorized)
+        return self.observe(out)
+
+    def step(self, action, out=None):
+        sim = self.sim
+        score = sim.score
+        sim.change_direction(ACTIONS[action])
+        sim.run(sim.snake_interval - sim.snake_timer)
+        reward = float(sim.score - score)
+        if sim.over:
+            reward -= DEATH_PENALTY
+        done = sim.over or sim.ticks >= self.max_ticks
+        info = {"score": sim.score, "length": len(sim.snake.body), "ticks": sim.ticks}
+        return self.observe(out), reward, done, info
+
+    def observe(self, out=None):
+        if out is None:
+            out = np.zeros(self.shape, np.uint8)
+        else:
+            out[...] = 0
+        sim = self.sim
+        grid = sim.grid
+        rows, cols = self.shape[1:]
+        np.minimum(grid.views()[0].reshape(rows, cols), 1, out=out[BODY])
+        out[HEAD].flat[grid.cell(sim.snake.head)] = 1
+        for food in sim.food:
+            out[FOOD + food["bonus"]].flat[grid.cell(food["pos"])] = 1
+        for item in sim.items:
+            out[ITEMS].flat[grid.cell(item["pos"])] = item["type"] + 1
+        if sim.vectorized:
+            out[ENEMIES][sim.enemies.row, sim.enemies.col] = 1
+        else:
+            for enemy in sim.enemies:
+                out[ENEMIES].flat[grid.cell(enemy["pos"])] = 1
+        for boss in sim.bosses:
+            out[BOSSES].flat[sim.boss_cells(boss)] = 1
+        return out
+
+
+def shared_arrays(buffer, shape):
+    # one shared block: rewards (float32), actions and dones (uint8), then observations
+    count = shape[0]
+    rewards = np.ndarray(count, np.float32, buffer=buffer)
+    actions = np.ndarray(count, np.uint8, buffer=buffer, offset=4 * count)
+    dones = np.ndarray(count, np.uint8, buffer=buffer, offset=5 * count)
+    obs = np.ndarray(shape, np.uint8, buffer=buffer, offset=6 * count)
+    return rewards, actions, dones, obs
+
+
+def worker(connection, name, shape, first, count, seed, env_kwargs):
+    # owns envs first..first+count-1; reads their actions from shared memory and writes
+    # back observations, rewards and dones, so the pipe only carries finished episodes
+    memory = shared_memory.SharedMemory(name=name)
+    rewards, actions, dones, obs = shared_arrays(memory.buf, shape)
+    # env i plays seeds seed + i, seed + i + n, seed + i + 2n...: no two envs share a game
+    envs = [SnakeEnv(seed=seed + first + i, seed_stride=shape[0], **env_kwargs) for i in range(count)]
+    try:
+        while True:
+            command = connection.recv()
+            if command == "reset":
+                for i, env in enumerate(envs):
+                    env.reset(out=obs[first + i])
+                connection.send(None)
+            elif command == "step":
+                finished = []
+                for i, env in enumerate(envs):
+                    index = first + i
+                    view = obs[index]
+                    _, reward, done, info = env.step(actions[index], out=view)
+                    rewards[index] = reward
+                    dones[index] = done
+                    if done:
+                        env.reset(out=view)
+                        finished.append((index, info))
+                connection.send(finished)
+            elif command == "close":
+                break
+    finally:
+        del rewards, actions, dones, obs
+        memory.close()
+        connection.close()
+
+
+class VecEnv:
+    # n independent SnakeEnvs split across worker processes. Actions, rewards, dones and
+    # observations live in one shared block; a finished env resets itself, and its
+    # info (score, length, ticks) comes back in infos[i], which is empty otherwise
+    def __init__(self, count, workers=None, seed=0, **env_kwargs):
+        workers = min(count, workers or multiprocessing.cpu_count())
+        self.count = count
+        self.shape = (count,) + SnakeEnv(**env_kwargs).shape
+        self.memory = shared_memory.SharedMemory(create=True, size=6 * count + int(np.prod(self.shape)))
+        self.rewards, self.actions, self.dones, self.obs = shared_arrays(self.memory.buf, self.shape)
+        self.connections = []
+        self.processes = []
+        for w in range(workers):
+            first = count * w // workers
+            size = count * (w + 1) // workers - first
+            parent, child = multiprocessing.Pipe()
+            process = multiprocessing.Process(
+                target=worker, args=(child, self.memory.name, self.shape, first, size, seed, env_kwargs),
+                daemon=True)
+            process.start()
+            child.close()
+            self.connections.append(parent)
+            self.processes.append(process)
+
+    def reset(self):
+        for connection in self.connections:
+            connection.send("reset")
+        for connection in self.connections:
+            connection.recv()
+        return self.obs
+
+    def step(self, actions):
+        # the returned arrays are overwritten by the next step; copy them to keep them
+        self.actions[:] = actions
+        for connection in self.connections:
+            connection.send("step")
+        infos = [{} for _ in range(self.count)]
+        for connection in self.connections:
+            for index, info in connection.recv():
+                infos[index] = info
+        return self.obs, self.rewards, self.dones.view(bool), infos
+
+    def close(self):
+        for connection in self.connections:
+            try:
+                connection.send("close")
+            except (BrokenPipeError, OSError):
+                pass
+        for process in self.processes:
+            process.join(timeout=5)
+        del self.rewards, self.actions, self.dones, self.obs
+        self.memory.close()
+        self.memory.unlink()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
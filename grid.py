@@ -0,0 +1,202 @@
+from array import array
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+SPARSE_APPLY = 16  # apply() sorts the cells it is given when the board has this many times more
+
+
+class OccupancyGrid:
+    # one cell per block. snake[cell] counts the snake segments on it (owner[cell] is the
+    # id of the snake that got there first, for games with several), enemy[cell] the
+    # enemies (enemy_dir[cell] is the DIRECTIONS index of the last one to arrive) and
+    # load[cell] everything (snake, enemies, bosses, food, items). free[:free_count] lists
+    # the cells with nothing on them, in any order, and where[cell] is the cell's index
+    # in free, so both updates and uniform sampling are O(1)
+    def __init__(self, cols, rows, block_size):
+        self.cols = cols
+        self.rows = rows
+        self.block_size = block_size
+        cells = cols * rows
+        self.snake = bytearray(cells)
+        self.owner = array('I', bytes(4 * cells))
+        self.enemy = array('H', bytes(2 * cells))
+        self.enemy_dir = bytearray(cells)
+        self.load = array('i', bytes(4 * cells))
+        self.free = array('i', range(cells))
+        self.where = array('i', range(cells))
+        self.free_count = cells
+        self._views = None
+
+    def cell(self, pos):
+        return pos[1] // self.block_size * self.cols + pos[0] // self.block_size
+
+    def pos(self, cell):
+        return (cell % self.cols * self.block_size, cell // self.cols * self.block_size)
+
+    def occupy(self, cell):
+        self.load[cell] += 1
+        if self.load[cell] == 1:
+            # swap the cell with the last free one and shrink the free part
+            self.free_count -= 1
+            self._swap(cell, self.free[self.free_count])
+
+    def release(self, cell):
+        self.load[cell] -= 1
+        if self.load[cell] == 0:
+            self._swap(cell, self.free[self.free_count])
+            self.free_count += 1
+
+    def _swap(self, cell, other):
+        free = self.free
+        where = self.where
+        index = where[cell]
+        other_index = where[other]
+        free[index] = other
+        free[other_index] = cell
+        where[other] = index
+        where[cell] = other_index
+
+    def snapshot(self):
+        return (bytes(self.snake), self.owner.tobytes(), self.enemy.tobytes(), bytes(self.enemy_dir),
+                self.load.tobytes(), self.free.tobytes(), self.where.tobytes(), self.free_count)
+
+    def restore(self, state):
+        # copied in place, so numpy views of the arrays stay valid
+        snake, owner, enemy, enemy_dir, load, free, where, self.free_count = state
+        self.snake[:] = snake
+        memoryview(self.owner).cast('B')[:] = owner
+        memoryview(self.enemy).cast('B')[:] = enemy
+        self.enemy_dir[:] = enemy_dir
+        memoryview(self.load).cast('B')[:] = load
+        memoryview(self.free).cast('B')[:] = free
+        memoryview(self.where).cast('B')[:] = where
+
+    def views(self):
+        # numpy arrays sharing memory with snake, load, free, where, enemy and enemy_dir;
+        # the arrays are never resized, so the views stay valid for the grid's lifetime
+        if self._views is None:
+            self._views = (np.frombuffer(self.snake, np.uint8), np.frombuffer(self.load, np.intc),
+                           np.frombuffer(self.free, np.intc), np.frombuffer(self.where, np.intc),
+                           np.frombuffer(self.enemy, np.uint16), np.frombuffer(self.enemy_dir, np.uint8))
+        return self._views
+
+    def apply(self, occupied=(), released=(), enemies=False):
+        # occupy/release for whole arrays of cells at once (needs numpy); cells may repeat.
+        # With enemies set the cells are enemies coming and going, counted in enemy too
+        snake, load, free, where, enemy, enemy_dir = self.views()
+        occupied = np.asarray(occupied, np.intp)
+        released = np.asarray(released, np.intp)
+        # net change per touched cell, sorted by cell. Sorting the touched cells costs
+        # less than a histogram of the whole board unless they are a good part of it
+        if SPARSE_APPLY * (len(occupied) + len(released)) < len(load):
+            cells, inverse = np.unique(np.concatenate((occupied, released)), return_inverse=True)
+            change = (np.bincount(inverse[:len(occupied)], minlength=len(cells))
+                      - np.bincount(inverse[len(occupied):], minlength=len(cells)))
+            moved = change != 0
+            cells = cells[moved]
+            change = change[moved]
+        else:
+            change = np.bincount(occupied, minlength=len(load)) - np.bincount(released, minlength=len(load))
+            cells = np.flatnonzero(change)
+            change = change[cells]
+        if enemies:
+            enemy[cells] += change.astype(np.uint16)
+        before = load[cells]
+        after = before + change.astype(np.intc)
+        load[cells] = after
+        busy = cells[(before == 0) & (after > 0)]
+        freed = cells[(before > 0) & (after == 0)]
+
+        # shrink the free part past the cells that filled up: free cells from the
+        # dropped tail take the places they leave behind
+        count = self.free_count
+        new_count = count - len(busy)
+        holes = where[busy]
+        holes = holes[holes < new_count]
+        tail = free[new_count:count]
+        movers = tail[load[tail] == 0]
+        free[holes] = movers
+        where[movers] = holes
+        free[new_count:count] = busy
+        where[busy] = np.arange(new_count, count, dtype=np.intc)
+
+        # and grow it over the cells that emptied, the same way round
+        count = new_count
+        new_count = count + len(freed)
+        holes = where[freed]
+        holes = holes[holes >= new_count]
+        head = free[count:new_count]
+        movers = head[load[head] > 0]
+        free[holes] = movers
+        where[movers] = holes
+        free[count:new_count] = freed
+        where[freed] = np.arange(count, new_count, dtype=np.intc)
+        self.free_count = new_count
+
+    def random_free(self, rng):
+        if not self.free_count:
+            return None
+        return self.free[int(rng.random() * self.free_count)]
+
+    def add_snake(self, cell, owner=0):
+        # a snake running into another one dies and is removed at once, so the cell
+        # stays with the snake that was there
+        if not self.snake[cell]:
+            self.owner[cell] = owner
+        self.snake[cell] += 1
+        self.occupy(cell)
+
+    def remove_snake(self, cell):
+        self.snake[cell] -= 1
+        self.release(cell)
+
+    def add_enemy(self, cell, code):
+        self.enemy[cell] += 1
+        self.enemy_dir[cell] = code
+        self.occupy(cell)
+
+    def remove_enemy(self, cell):
+        self.enemy[cell] -= 1
+        self.release(cell)
+
+    def block_cells(self, cell, span):
+        # the span x span square whose top-left is cell, wrapping around the edges
+        cols = self.cols
+        col = cell % cols
+        row = cell // cols
+        return [(row + dy) % self.rows * cols + (col + dx) % cols
+                for dy in range(span) for dx in range(span)]
+
+    def neighbour(self, cell, direction):
+        # the next cell along direction, wrapping around the edges
+        cols = self.cols
+        return ((cell // cols + direction[1]) % self.rows * cols
+                + (cell % cols + direction[0]) % cols)
+
+    def distances(self, origins, radius=None):
+        # BFS steps from the nearest of origins, moving like the snake does, as
+        # {cell: steps}; with a radius the search stops there, so its cost doesn't
+        # grow with the board
+        cols = self.cols
+        cells = len(self.snake)
+        last = cells - cols
+        field = dict.fromkeys(origins, 0)
+        frontier = list(field)
+        step = 0
+        while frontier and step != radius:
+            step += 1
+            reached = []
+            for cell in frontier:
+                col = cell % cols
+                for near in (cell - cols if cell >= cols else cell + last,
+                             cell + cols if cell < last else cell - last,
+                             cell - 1 if col else cell + cols - 1,
+                             cell + 1 if col < cols - 1 else cell - col):
+                    if near not in field:
+                        field[near] = step
+                        reached.append(near)
+            frontier = reached
+        return field
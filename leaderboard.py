@@ -0,0 +1,80 @@
+import bisect
+import heapq
+import math
+import os
+
+SCORE_FILE = 'score.txt'
+TOP_SIZE = 100
+COMPACT_EVERY = 50  # appended lines between rewrites of the file
+
+
+class Leaderboard:
+    # best TOP_SIZE scores kept sorted in memory; new scores are appended to the file
+    # and the file is rewritten with just the top entries every COMPACT_EVERY saves
+    def __init__(self, caminho=SCORE_FILE, size=TOP_SIZE):
+        self.caminho = caminho
+        self.size = size
+        self.entries = []
+        self.keys = []
+        self.appended = 0
+        self.needs_newline = False
+        self.load()
+
+    def load(self):
+        if not os.path.exists(self.caminho):
+            return
+        # bounded min-heap of (score, -line, nome): a huge file never sits in memory and
+        # ties keep file order, like the old stable sort
+        heap = []
+        lines = 0
+        linha = '\n'
+        with open(self.caminho, 'r', encoding='utf-8', errors='replace') as f:
+            for lines, linha in enumerate(f, 1):
+                nome, sep, score = linha.rpartition(',')
+                if not sep:
+                    continue
+                try:
+                    value = float(score)
+                except ValueError:
+                    continue
+                if len(heap) < self.size:
+                    if math.isfinite(value):
+                        heapq.heappush(heap, (value, -lines, nome))
+                elif value > heap[0][0] and math.isfinite(value):
+                    heapq.heapreplace(heap, (value, -lines, nome))
+        heap.sort(reverse=True)
+        self.entries = [(nome, value) for value, line, nome in heap]
+        self.keys = [-value for nome, value in self.entries]
+        self.needs_newline = not linha.endswith('\n')
+        if lines - len(self.entries) > COMPACT_EVERY:
+            self.compact()
+
+    def top(self, count=10):
+        return self.entries[:count]
+
+    def add(self, nome, score):
+        index = bisect.bisect_right(self.keys, -score)
+        if index < self.size:
+            self.keys.insert(index, -score)
+            self.entries.insert(index, (nome, score))
+            del self.keys[self.size:]
+            del self.entries[self.size:]
+
+        # one write per line keeps appends whole; a torn last line gets its own line break
+        prefix = '\n' if self.needs_newline else ''
+        with open(self.caminho, 'a', encoding='utf-8') as f:
+            f.write(f"{prefix}{nome},{score}\n")
+        self.needs_newline = False
+        self.appended += 1
+        if self.appended >= COMPACT_EVERY:
+            self.compact()
+
+    def compact(self):
+        temporario = f"{self.caminho}.tmp"
+        with open(temporario, 'w', encoding='utf-8') as f:
+            f.writelines(f"{nome},{score}\n" for nome, score in self.entries)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(temporario, self.caminho)
+        self.appended = 0
+        self.needs_newline = False
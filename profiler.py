@@ -0,0 +1,87 @@
+import csv
+import json
+import time
+from array import array
+
+PHASES = ("events", "update", "draw", "flip")
+PROFILE_FRAMES = 600  # ring buffer length: 10 s at 60 FPS
+
+
+# func
+def percentile(ordered, p):
+    # nearest rank in an already sorted list; every p50/p99 in the game and its tools
+    # comes from here, so they all mean the same thing
+    if not ordered:
+        return 0
+    return ordered[min(len(ordered) - 1, len(ordered) * p // 100)]
+
+
+class FrameProfiler:
+    # time spent in each phase of the last PROFILE_FRAMES frames, in preallocated
+    # ring buffers; the game only calls into it while enabled is set
+    def __init__(self, budget, frames=PROFILE_FRAMES):
+        self.enabled = False
+        self.budget = budget  # a frame whose phases add up to more than this is dropped
+        self.size = frames
+        self.samples = {phase: array('d', bytes(8 * frames)) for phase in PHASES + ("frame",)}
+        self.index = 0
+        self.count = 0
+        self.frames = 0
+        self.dropped = 0
+        self.last = 0.0
+
+    def start(self):
+        for phase in PHASES:
+            self.samples[phase][self.index] = 0.0
+        self.last = time.perf_counter()
+
+    def mark(self, phase):
+        now = time.perf_counter()
+        self.samples[phase][self.index] = now - self.last
+        self.last = now
+
+    def end_frame(self):
+        index = self.index
+        total = sum(self.samples[phase][index] for phase in PHASES)
+        self.samples["frame"][index] = total
+        if total > self.budget:
+            self.dropped += 1
+        self.frames += 1
+        self.index = (index + 1) % self.size
+        self.count = min(self.count + 1, self.size)
+
+    def recent(self, phase):
+        # oldest first
+        samples = self.samples[phase]
+        if self.count < self.size:
+            return samples[:self.count].tolist()
+        return (samples[self.index:] + samples[:self.index]).tolist()
+
+    def percentiles(self, phase, points=(50, 95, 99)):
+        ordered = sorted(self.recent(phase))
+        return [percentile(ordered, p) for p in points]
+
+    def summary(self):
+        return {
+            "frames": self.frames,
+            "dropped": self.dropped,
+            "budget_ms": self.budget * 1e3,
+            "phases_ms": {phase: dict(zip(("p50", "p95", "p99"), (t * 1e3 for t in self.percentiles(phase))))
+                          for phase in PHASES + ("frame",)},
+        }
+
+    def dump(self, caminho):
+        if not self.count:
+            return
+        columns = PHASES + ("frame",)
+        rows = list(zip(*(self.recent(phase) for phase in columns)))
+        if caminho.endswith(".csv"):
+            with open(caminho, 'w', newline='') as f:
+                writer = csv.writer(f)
+                writer.writerow([f"{phase}_ms" for phase in columns])
+                writer.writerows([f"{t * 1e3:.4f}" for t in row] for row in rows)
+        else:
+            with open(caminho, 'w') as f:
+                json.dump(dict(self.summary(), samples_ms={phase: [t * 1e3 for t in self.recent(phase)]
+                                                           for phase in columns}), f)
+        print(f"Perfil de quadros salvo em {caminho}")
@@ -0,0 +1,225 @@
+import struct
+from array import array
+from collections import deque
+
+from simulation import DIRECTIONS
+
+# every message is its size (u32) then a type byte and the body
+JOIN = b"J"  # cliente: nome em utf-8
+TURN = b"D"  # cliente: indice em DIRECTIONS
+WELCOME = b"W"  # servidor: id do jogador, colunas, linhas
+SNAPSHOT = b"S"  # servidor: o estado inteiro, ou so o que mudou desde o anterior
+
+FRAME = struct.Struct("<I")
+WELCOME_BODY = struct.Struct("<HHH")
+SNAPSHOT_HEADER = struct.Struct("<IdBH")  # tick, hora do servidor, secoes, cobras
+SNAKE_HEADER = struct.Struct("<HB")  # id, flags
+SNAKE_FULL = struct.Struct("<BII")  # direcao, pontos, tamanho; depois as celulas
+SNAKE_DELTA = struct.Struct("<HH")  # passos da cabeca, celulas tiradas da cauda; depois as direcoes
+SCORE = struct.Struct("<I")
+CELL = struct.Struct("<IB")  # celula e um byte (bonus, tipo ou direcao)
+COUNT = struct.Struct("<I")
+
+# secoes presentes num snapshot; as ausentes nao mudaram
+FOOD, ITEMS, ENEMIES, BOSSES = 1, 2, 4, 8
+# flags de uma cobra: corpo inteiro a seguir, morreu/saiu, pontos a seguir
+FULL, DEAD, SCORED = 1, 2, 4
+
+
+# func
+def frame(message):
+    return FRAME.pack(len(message)) + message
+
+
+def split_frames(buffer):
+    # complete messages at the front of buffer, which keeps whatever is left
+    messages = []
+    while len(buffer) >= FRAME.size:
+        size = FRAME.unpack_from(buffer)[0]
+        end = FRAME.size + size
+        if len(buffer) < end:
+            break
+        messages.append(bytes(buffer[FRAME.size:end]))
+        del buffer[:end]
+    return messages
+
+
+async def read_message(reader):
+    size = FRAME.unpack(await reader.readexactly(FRAME.size))[0]
+    return await reader.readexactly(size)
+
+
+def encode_cells(out, entries):
+    out += COUNT.pack(len(entries))
+    for cell, value in entries:
+        out += CELL.pack(cell, value)
+
+
+class SnapshotEncoder:
+    # turns an Arena into SNAPSHOT messages. delta() holds what changed since the
+    # previous delta: for each snake that moved, the direction of every step its head
+    # took (one byte each; the client works out the cells) and how many cells left its
+    # tail, its score only if it changed; then food, items, enemies or bosses only
+    # when they changed, sent whole since they are small. It is the same
+    # for every client, so it is built once per broadcast; keyframe() is the whole
+    # state, for a client's first snapshot
+    def __init__(self, arena):
+        self.arena = arena
+        self.food = None
+        self.items = None
+        self.enemy_version = None
+        self.boss_version = None
+        self.scores = {}  # player id -> score in the last delta
+
+    def keyframe(self, now):
+        arena = self.arena
+        snakes = [(player, True) for player in arena.players.values() if player.snake is not None]
+        return self.encode(now, snakes, FOOD | ITEMS | ENEMIES | BOSSES)
+
+    def delta(self, now):
+        arena = self.arena
+        snakes = [(player_id, None) for player_id in arena.left]
+        arena.left.clear()
+        for player in arena.players.values():
+            snake = player.snake
+            if player.spawned or player.died or (snake is not None and (player.pushed or snake.vacated)):
+                snakes.append((player, player.spawned))
+        sections = 0
+        if arena.food is not self.food:
+            sections |= FOOD
+        if arena.items is not self.items:
+            sections |= ITEMS
+        if arena.enemy_version != self.enemy_version:
+            sections |= ENEMIES
+        if arena.boss_version != self.boss_version:
+            sections |= BOSSES
+        message = self.encode(now, snakes, sections)
+
+        for player in arena.players.values():
+            player.pushed.clear()
+            if player.snake is not None:
+                player.snake.vacated.clear()
+            player.spawned = player.died = False
+            self.scores[player.id] = player.score
+        for player_id in list(self.scores):
+            if player_id not in arena.players:
+                del self.scores[player_id]
+        self.food = arena.food
+        self.items = arena.items
+        self.enemy_version = arena.enemy_version
+        self.boss_version = arena.boss_version
+        return message
+
+    def encode(self, now, snakes, sections):
+        arena = self.arena
+        grid = arena.grid
+        out = bytearray(SNAPSHOT)
+        out += SNAPSHOT_HEADER.pack(arena.ticks, now, sections, len(snakes))
+        for player, full in snakes:
+            if full is None:
+                out += SNAKE_HEADER.pack(player, DEAD)
+                continue
+            snake = player.snake
+            if snake is None:
+                out += SNAKE_HEADER.pack(player.id, DEAD)
+            elif full:
+                out += SNAKE_HEADER.pack(player.id, FULL)
+                out += SNAKE_FULL.pack(DIRECTIONS.index(snake.direction), player.score, len(snake.body))
+                out += array('I', snake.body).tobytes()
+            else:
+                # popped may outnumber the old body when cells pushed since were popped too;
+                # the client pushes first, then pops
+                scored = self.scores.get(player.id) != player.score
+                out += SNAKE_HEADER.pack(player.id, SCORED if scored else 0)
+                out += SNAKE_DELTA.pack(len(player.pushed), len(snake.vacated))
+                out += bytes(player.pushed)
+                if scored:
+                    out += SCORE.pack(player.score)
+        if sections & FOOD:
+            encode_cells(out, [(grid.cell(f["pos"]), f["bonus"]) for f in arena.food])
+        if sections & ITEMS:
+            encode_cells(out, [(grid.cell(item["pos"]), item["type"]) for item in arena.items])
+        if sections & ENEMIES:
+            enemies = list(arena.enemies)
+            out += COUNT.pack(len(enemies))
+            out += array('I', (grid.cell(e["pos"]) for e in enemies)).tobytes()
+            out += bytes(DIRECTIONS.index(tuple(e["dir"])) for e in enemies)
+        if sections & BOSSES:
+            encode_cells(out, [(grid.cell(boss["pos"]), DIRECTIONS.index(boss["dir"])) for boss in arena.bosses])
+        return bytes(out)
+
+
+class ClientState:
+    # the client's copy of the arena, rebuilt from WELCOME and SNAPSHOT messages.
+    # Cells are grid indices; snakes maps a player id to [body, direction, score]
+    # with the body a deque, head first
+    def __init__(self):
+        self.player_id = None
+        self.cols = self.rows = 0
+        self.tick = 0
+        self.sent = 0.0  # server clock when the last snapshot left
+        self.snakes = {}
+        self.food = []
+        self.items = []
+        self.enemies = []
+        self.bosses = []
+
+    def handle(self, message):
+        kind = message[:1]
+        if kind == WELCOME:
+            self.player_id, self.cols, self.rows = WELCOME_BODY.unpack_from(message, 1)
+        elif kind == SNAPSHOT:
+            self.apply(message)
+
+    def apply(self, message):
+        self.tick, self.sent, sections, count = SNAPSHOT_HEADER.unpack_from(message, 1)
+        pos = 1 + SNAPSHOT_HEADER.size
+        cols, rows = self.cols, self.rows
+        for _ in range(count):
+            player_id, flags = SNAKE_HEADER.unpack_from(message, pos)
+            pos += SNAKE_HEADER.size
+            if flags & DEAD:
+                self.snakes.pop(player_id, None)
+            elif flags & FULL:
+                direction, score, size = SNAKE_FULL.unpack_from(message, pos)
+                pos += SNAKE_FULL.size
+                body = array('I', message[pos:pos + 4 * size])
+                pos += 4 * size
+                self.snakes[player_id] = [deque(body), direction, score]
+            else:
+                pushed, popped = SNAKE_DELTA.unpack_from(message, pos)
+                pos += SNAKE_DELTA.size
+                snake = self.snakes[player_id]
+                body = snake[0]
+                for direction in message[pos:pos + pushed]:
+                    # one step from the old head, wrapping around like Snake.move
+                    dx, dy = DIRECTIONS[direction]
+                    head = body[0]
+                    body.appendleft((head // cols + dy) % rows * cols + (head % cols + dx) % cols)
+                    snake[1] = direction
+                pos += pushed
+                for _ in range(popped):
+                    body.pop()
+                if flags & SCORED:
+                    snake[2] = SCORE.unpack_from(message, pos)[0]
+                    pos += SCORE.size
+        if sections & FOOD:
+            self.food, pos = self.decode_cells(message, pos)
+        if sections & ITEMS:
+            self.items, pos = self.decode_cells(message, pos)
+        if sections & ENEMIES:
+            size = COUNT.unpack_from(message, pos)[0]
+            pos += COUNT.size
+            cells = array('I', message[pos:pos + 4 * size])
+            pos += 4 * size
+            self.enemies = list(zip(cells, message[pos:pos + size]))
+            pos += size
+        if sections & BOSSES:
+            self.bosses, pos = self.decode_cells(message, pos)
+
+    @staticmethod
+    def decode_cells(message, pos):
+        size = COUNT.unpack_from(message, pos)[0]
+        pos += COUNT.size
+        entries = [CELL.unpack_from(message, pos + CELL.size * i) for i in range(size)]
+        return entries, pos + CELL.size * size
@@ -0,0 +1,306 @@
+from collections import OrderedDict
+
+import pygame
+
+from simulation import DIRECTIONS
+
+TEXT_CACHE_SIZE = 256
+CHUNK_CELLS = 16  # side of a background chunk, in cells
+CHUNK_CACHE_SIZE = 64  # chunks kept around; a 1000x800 view spans at most 20
+
+
+class TextCache:
+    # one Font per size, plus an LRU of rendered surfaces keyed by (text, size, color)
+    def __init__(self, max_surfaces=TEXT_CACHE_SIZE):
+        self.fonts = {}
+        self.surfaces = OrderedDict()
+        self.max_surfaces = max_surfaces
+
+    def font(self, size):
+        font = self.fonts.get(size)
+        if font is None:
+            font = self.fonts[size] = pygame.font.Font(None, size)
+        return font
+
+    def render(self, text, size, color):
+        key = (text, size, color)
+        surface = self.surfaces.get(key)
+        if surface is None:
+            surface = self.font(size).render(text, True, color)
+            self.surfaces[key] = surface
+            if len(self.surfaces) > self.max_surfaces:
+                self.surfaces.popitem(last=False)
+        else:
+            self.surfaces.move_to_end(key)
+        return surface
+
+
+class PlayfieldRenderer:
+    # repaints only what changed since the last frame: the rects under last frame's
+    # moving sprites, the snake cells that were vacated and the info panel. draw()
+    # returns the rects to push to the display, or None when the whole screen changed.
+    # The head, enemies and bosses slide between cells: subtick is the fraction of a
+    # tick the game has accumulated past sim.ticks
+    def __init__(self, screen, images, text, panel_width, hud_color=(255, 255, 255)):
+        self.screen = screen
+        self.images = images
+        self.text = text
+        self.background = images["game_background"].convert()
+        self.field_rect = self.background.get_rect()
+        self.panel_rect = pygame.Rect(self.field_rect.right, 0, panel_width, self.field_rect.height)
+        self.hud_color = hud_color
+        self.sim = None
+        self.sprite_rects = []
+        self.hud_lines = None
+
+    def invalidate(self):
+        self.sim = None
+
+    def draw(self, sim, subtick=0.0):
+        if sim is not self.sim:
+            self.repaint(sim, subtick)
+            return None
+        screen = self.screen
+        background = self.background
+        snake = sim.snake
+
+        screen.set_clip(self.field_rect)
+        grid = snake.grid
+        size = grid.block_size
+        # restore whole cells so body segments can be redrawn without blending twice
+        restored = [self.snap(rect, size) for rect in self.sprite_rects]
+        if snake.vacated:
+            restored.extend(pygame.Rect(grid.pos(cell), (size, size)) for cell in snake.vacated)
+            snake.vacated.clear()
+        for rect in restored:
+            screen.blit(background, rect, rect)
+        head = grid.cell(snake.head)
+        for rect in restored:
+            self.draw_body_in(grid, rect, head)
+
+        self.sprite_rects = self.draw_sprites(sim, subtick)
+        screen.set_clip(None)
+        dirty = restored + self.sprite_rects
+        if self.draw_hud(sim):
+            dirty.append(self.panel_rect)
+        return dirty
+
+    def repaint(self, sim, subtick=0.0):
+        self.sim = sim
+        sim.snake.vacated = []
+        self.screen.set_clip(self.field_rect)
+        self.screen.blit(self.background, (0, 0))
+        body = self.images["snake_body"]
+        positions = sim.snake.positions()
+        next(positions, None)  # the head cell is left to the sliding head sprite
+        for pos in positions:
+            self.screen.blit(body, pos)
+        self.sprite_rects = self.draw_sprites(sim, subtick)
+        self.screen.set_clip(None)
+        self.hud_lines = None
+        self.draw_hud(sim)
+
+    @staticmethod
+    def snap(rect, size):
+        left = rect.left // size * size
+        top = rect.top // size * size
+        return pygame.Rect(left, top, -(-rect.right // size) * size - left, -(-rect.bottom // size) * size - top)
+
+    @staticmethod
+    def lerp(previous, current, alpha, size):
+        # a jump of more than a cell means it wrapped around an edge: no sliding across the board
+        dx = current[0] - previous[0]
+        dy = current[1] - previous[1]
+        if abs(dx) > size or abs(dy) > size:
+            return current
+        return (round(previous[0] + dx * alpha), round(previous[1] + dy * alpha))
+
+    def draw_body_in(self, grid, rect, head):
+        size = grid.block_size
+        body = self.images["snake_body"]
+        first_col = max(0, rect.left // size)
+        last_col = min(grid.cols - 1, (rect.right - 1) // size)
+        first_row = max(0, rect.top // size)
+        last_row = min(grid.rows - 1, (rect.bottom - 1) // size)
+        for row in range(first_row, last_row + 1):
+            base = row * grid.cols
+            for col in range(first_col, last_col + 1):
+                cell = base + col
+                if grid.snake[cell] and cell != head:
+                    self.screen.blit(body, (col * size, row * size))
+
+    def draw_sprites(self, sim, subtick=0.0):
+        screen = self.screen
+        images = self.images
+        size = sim.grid.block_size
+        snake = sim.snake
+        alpha = min(1.0, (sim.snake_timer + subtick) / sim.snake_interval)
+        head = self.lerp(snake.previous_head, snake.head, alpha, size)
+        rects = [screen.blit(images["snake_head"][snake.direction], head)]
+        for f in sim.food:
+            rects.append(screen.blit(images["food"][f["bonus"]], f["pos"]))
+        for item in sim.items:
+            rects.append(screen.blit(images["item"], item["pos"]))
+        # enemies always step one cell along dir, so where they came from is implied
+        back = (1.0 - min(1.0, (sim.enemy_timer + subtick) / sim.enemy_interval)) * size
+        for enemy in sim.enemies:
+            x, y = enemy["pos"]
+            dx, dy = enemy["dir"]
+            rects.append(screen.blit(images["enemy"][enemy["dir"]], (round(x - dx * back), round(y - dy * back))))
+        width, height = self.field_rect.size
+        alpha = min(1.0, (sim.boss_timer + subtick) / sim.boss_interval)
+        for boss in sim.bosses:
+            image = images["boss"][boss["dir"]]
+            x, y = self.lerp(boss.get("prev", boss["pos"]), boss["pos"], alpha, size)
+            extent = boss["size"]
+            # a boss across an edge wraps around, so it shows up on both sides
+            for bx in ((x, x - width) if x + extent > width else (x,)):
+                for by in ((y, y - height) if y + extent > height else (y,)):
+                    rects.append(screen.blit(image, (bx, by)))
+        return rects
+
+    def draw_hud(self, sim):
+        lines = (f"Tempo: {sim.elapsed_time:.1f}s",
+                 f"Pontuação: {sim.score:.2f}",
+                 f"Comidas: {sim.food_collected}")
+        if lines == self.hud_lines:
+            return False
+        self.hud_lines = lines
+        pygame.draw.rect(self.screen, (50, 50, 50), self.panel_rect)
+        x = self.panel_rect.left + 10
+        for i, line in enumerate(lines):
+            self.screen.blit(self.text.render(line, 24, self.hud_color), (x, 10 + 20 * i))
+        return True
+
+
+class WorldRenderer(PlayfieldRenderer):
+    # for a board bigger than the window: a camera follows the head and only what is
+    # under it gets drawn, every frame. The background is cut into chunks, tiled from
+    # the background image the first time they come into view and kept in an LRU;
+    # the sprites come from a scan of the grid cells in view (body, food, items and
+    # enemies all leave a mark there), so a frame costs about the same however big
+    # the world is or however many enemies roam it. Bosses are few, so they are
+    # culled from their list
+    def __init__(self, screen, images, text, panel_width, hud_color=(255, 255, 255),
+                 max_chunks=CHUNK_CACHE_SIZE):
+        super().__init__(screen, images, text, panel_width, hud_color)
+        self.chunks = OrderedDict()
+        self.max_chunks = max_chunks
+        self.camera = (0, 0)
+
+    def draw(self, sim, subtick=0.0):
+        repaint = sim is not self.sim
+        if repaint:
+            self.sim = sim
+            self.chunks.clear()
+            self.hud_lines = None
+        screen = self.screen
+        view = self.field_rect
+        grid = sim.grid
+        size = grid.block_size
+        snake = sim.snake
+        alpha = min(1.0, (sim.snake_timer + subtick) / sim.snake_interval)
+        head = self.lerp(snake.previous_head, snake.head, alpha, size)
+        # centred on the head, but never showing past the edges of the world
+        left = max(0, min(head[0] + size // 2 - view.width // 2, sim.width - view.width))
+        top = max(0, min(head[1] + size // 2 - view.height // 2, sim.height - view.height))
+        self.camera = (left, top)
+
+        screen.set_clip(view)
+        if sim.width < view.width or sim.height < view.height:
+            screen.fill((0, 0, 0), view)
+        self.draw_chunks(sim, left, top)
+        food, items, enemies = self.draw_cells(sim, left, top)
+        screen.blit(self.images["snake_head"][snake.direction], (head[0] - left, head[1] - top))
+        self.draw_entities(sim, left, top, subtick, food, items, enemies)
+        screen.set_clip(None)
+        dirty = [view]
+        if self.draw_hud(sim):
+            dirty.append(self.panel_rect)
+        return None if repaint else dirty
+
+    def chunk(self, sim, cx, cy):
+        key = (cx, cy)
+        surface = self.chunks.get(key)
+        if surface is not None:
+            self.chunks.move_to_end(key)
+            return surface
+        side = CHUNK_CELLS * sim.grid.block_size
+        x, y = cx * side, cy * side
+        surface = pygame.Surface((min(side, sim.width - x), min(side, sim.height - y))).convert()
+        background = self.background
+        width, height = background.get_size()
+        for tx in range(x - x % width, x + surface.get_width(), width):
+            for ty in range(y - y % height, y + surface.get_height(), height):
+                surface.blit(background, (tx - x, ty - y))
+        self.chunks[key] = surface
+        if len(self.chunks) > self.max_chunks:
+            self.chunks.popitem(last=False)
+        return surface
+
+    def draw_chunks(self, sim, left, top):
+        side = CHUNK_CELLS * sim.grid.block_size
+        right = min(sim.width, left + self.field_rect.width)
+        bottom = min(sim.height, top + self.field_rect.height)
+        for cy in range(top // side, -(-bottom // side)):
+            for cx in range(left // side, -(-right // side)):
+                self.screen.blit(self.chunk(sim, cx, cy), (cx * side - left, cy * side - top))
+
+    def draw_cells(self, sim, left, top):
+        # body segments are drawn straight away, the rest is gathered to go on top. One
+        # cell of margin catches enemies sliding in from just outside the view
+        screen = self.screen
+        grid = sim.grid
+        size = grid.block_size
+        cols = grid.cols
+        body = self.images["snake_body"]
+        head = grid.cell(sim.snake.head)
+        first_col = max(0, left // size - 1)
+        last_col = min(cols - 1, (left + self.field_rect.width) // size + 1)
+        first_row = max(0, top // size - 1)
+        last_row = min(grid.rows - 1, (top + self.field_rect.height) // size + 1)
+        load, snake, enemy = grid.load, grid.snake, grid.enemy
+        food, items, enemies = [], [], []
+        for row in range(first_row, last_row + 1):
+            base = row * cols
+            y = row * size
+            for col, count in enumerate(load[base + first_col:base + last_col + 1], first_col):
+                if not count:
+                    continue
+                cell = base + col
+                pos = (col * size, y)
+                if snake[cell] and cell != head:
+                    screen.blit(body, (pos[0] - left, y - top))
+                if enemy[cell]:
+                    enemies.append(cell)
+                if count > snake[cell] + enemy[cell]:
+                    if pos in sim.food_at:
+                        food.append(sim.food_at[pos])
+                    if pos in sim.item_at:
+                        items.append(sim.item_at[pos])
+        return food, items, enemies
+
+    def draw_entities(self, sim, left, top, subtick, food, items, enemies):
+        screen = self.screen
+        images = self.images
+        grid = sim.grid
+        size = grid.block_size
+        for f in food:
+            screen.blit(images["food"][f["bonus"]], (f["pos"][0] - left, f["pos"][1] - top))
+        for item in items:
+            screen.blit(images["item"], (item["pos"][0] - left, item["pos"][1] - top))
+        back = (1.0 - min(1.0, (sim.enemy_timer + subtick) / sim.enemy_interval)) * size
+        for cell in enemies:
+            direction = DIRECTIONS[grid.enemy_dir[cell]]
+            x, y = grid.pos(cell)
+            screen.blit(images["enemy"][direction],
+                        (round(x - direction[0] * back) - left, round(y - direction[1] * back) - top))
+        width, height = self.field_rect.size
+        alpha = min(1.0, (sim.boss_timer + subtick) / sim.boss_interval)
+        for boss in sim.bosses:
+            x, y = self.lerp(boss.get("prev", boss["pos"]), boss["pos"], alpha, size)
+            extent = boss["size"]
+            for bx in ((x, x - sim.width) if x + extent > sim.width else (x,)):
+                for by in ((y, y - sim.height) if y + extent > sim.height else (y,)):
+                    if left - extent < bx < left + width and top - extent < by < top + height:
+                        screen.blit(images["boss"][boss["dir"]], (bx - left, by - top))
@@ -0,0 +1,95 @@
+import struct
+
+from simulation import DIRECTIONS, Simulation
+
+REPLAY_MAGIC = b"CBRP"
+REPLAY_VERSION = 3  # 2: turns queue up instead of replacing each other; 3: u32 width and height
+# magic, versao, flags, seed, largura, altura, ticks, score, tamanho, entradas
+HEADER = struct.Struct("<4sBBQIIIdII")
+VECTORIZED = 1
+
+
+# func
+def encode_inputs(inputs):
+    # one varint per input: ticks since the previous one, shifted left by 2, plus the direction
+    out = bytearray()
+    last = 0
+    for tick, direction in inputs:
+        value = (tick - last) << 2 | DIRECTIONS.index(direction)
+        last = tick
+        while value > 0x7f:
+            out.append(value & 0x7f | 0x80)
+            value >>= 7
+        out.append(value)
+    return bytes(out)
+
+
+def decode_inputs(data, count):
+    inputs = []
+    tick = 0
+    pos = 0
+    for _ in range(count):
+        value = shift = 0
+        while True:
+            byte = data[pos]
+            pos += 1
+            value |= (byte & 0x7f) << shift
+            shift += 7
+            if byte < 0x80:
+                break
+        tick += value >> 2
+        inputs.append((tick, DIRECTIONS[value & 3]))
+    return inputs
+
+
+def save_replay(caminho, sim):
+    flags = VECTORIZED if sim.vectorized else 0
+    header = HEADER.pack(REPLAY_MAGIC, REPLAY_VERSION, flags, sim.seed, sim.width, sim.height,
+                         sim.ticks, sim.score, len(sim.snake.body), len(sim.inputs))
+    with open(caminho, 'wb') as f:
+        f.write(header + encode_inputs(sim.inputs))
+
+
+def load_replay(caminho):
+    with open(caminho, 'rb') as f:
+        data = f.read()
+    magic, version, flags, seed, width, height, ticks, score, length, count = HEADER.unpack_from(data)
+    if magic != REPLAY_MAGIC or version != REPLAY_VERSION:
+        raise ValueError(f"{caminho} nao e um replay valido")
+    return {"seed": seed, "width": width, "height": height, "vectorized": bool(flags & VECTORIZED),
+            "ticks": ticks, "score": score, "length": length,
+            "inputs": decode_inputs(data[HEADER.size:], count)}
+
+
+def replay(recorded):
+    # re-run the game headless: jump straight to each input's tick and apply it
+    sim = Simulation(recorded["width"], recorded["height"], seed=recorded["seed"],
+                     vectorized=recorded["vectorized"])
+    for tick, direction in recorded["inputs"]:
+        sim.run(tick - sim.ticks)
+        sim.change_direction(direction)
+    sim.run(recorded["ticks"] - sim.ticks)
+    return sim
+
+
+if __name__ == "__main__":
+    import argparse
+    import sys
+    import time
+
+    parser = argparse.ArgumentParser(description="reproduz partidas gravadas e confere o resultado")
+    parser.add_argument("arquivos", nargs="+")
+    args = parser.parse_args()
+
+    failed = 0
+    for caminho in args.arquivos:
+        recorded = load_replay(caminho)
+        start = time.perf_counter()
+        sim = replay(recorded)
+        elapsed = time.perf_counter() - start
+        ok = (sim.ticks, sim.score, len(sim.snake.body)) == (recorded["ticks"], recorded["score"], recorded["length"])
+        failed += not ok
+        print(f"{caminho}: {'ok' if ok else 'DIVERGIU'} - {len(recorded['inputs'])} entradas, "
+              f"{sim.ticks} ticks em {elapsed:.3f}s, score {sim.score} (gravado {recorded['score']}), "
+              f"tamanho {len(sim.snake.body)} (gravado {recorded['length']})")
+    sys.exit(1 if failed else 0)
@@ -0,0 +1,135 @@
+import asyncio
+import socket
+from array import array
+
+from arena import Arena
+from profiler import percentile
+from protocol import (JOIN, TURN, WELCOME, WELCOME_BODY, SnapshotEncoder, frame, read_message)
+from simulation import BLOCK_SIZE, DIRECTIONS, HEIGHT, WIDTH, ticks
+
+SEND_INTERVAL = 0.05  # seconds between snapshots; the rules still advance one TICK at a time
+MAX_BACKLOG = 1 << 20  # bytes waiting to go out to a client before it is dropped
+PORT = 5555
+
+
+class GameServer:
+    # runs an Arena at a fixed rate and streams it to every connected client over
+    # TCP. Each round runs SEND_INTERVAL worth of ticks and sends one snapshot: the
+    # shared delta, or the whole state to clients that just joined. Turns are applied
+    # as they arrive; the snake takes them on its next move
+    def __init__(self, width=WIDTH, height=HEIGHT, seed=None, interval=SEND_INTERVAL):
+        self.arena = Arena(width, height, seed=seed)
+        self.encoder = SnapshotEncoder(self.arena)
+        self.interval = interval
+        self.clients = {}  # player id -> StreamWriter
+        self.joining = set()  # ids still waiting for their first snapshot
+        self.round_times = array('d')  # seconds each round took to simulate and send
+        self.late = 0  # rounds that started after their slot was over
+        self.bytes_sent = 0
+        self.peak_clients = 0
+
+    async def handle(self, reader, writer):
+        sock = writer.get_extra_info("socket")
+        if sock is not None:
+            sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        player = None
+        try:
+            message = await read_message(reader)
+            if message[:1] != JOIN:
+                return
+            arena = self.arena
+            player = arena.join(message[1:].decode("utf-8", "replace"))
+            writer.write(frame(WELCOME + WELCOME_BODY.pack(player.id, arena.grid.cols, arena.grid.rows)))
+            self.clients[player.id] = writer
+            self.joining.add(player.id)
+            while True:
+                message = await read_message(reader)
+                if message[:1] == TURN and len(message) == 2 and message[1] < len(DIRECTIONS):
+                    arena.change_direction(player.id, DIRECTIONS[message[1]])
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            if player is not None:
+                self.clients.pop(player.id, None)
+                self.joining.discard(player.id)
+                self.arena.leave(player.id)
+            writer.close()
+
+    def broadcast(self, now):
+        delta = frame(self.encoder.delta(now))
+        keyframe = frame(self.encoder.keyframe(now)) if self.joining else None
+        for player_id, writer in list(self.clients.items()):
+            if writer.transport.get_write_buffer_size() > MAX_BACKLOG:
+                # too far behind to catch up on deltas; its handler cleans up
+                writer.transport.abort()
+                continue
+            message = keyframe if player_id in self.joining else delta
+            writer.write(message)
+            self.bytes_sent += len(message)
+        self.joining.clear()
+        self.peak_clients = max(self.peak_clients, len(self.clients))
+
+    def close(self):
+        # the handlers see their connection end and take their players out
+        for writer in self.clients.values():
+            writer.transport.abort()
+
+    async def run(self, seconds=None):
+        loop = asyncio.get_running_loop()
+        step = ticks(self.interval)
+        deadline = loop.time()
+        stop = None if seconds is None else deadline + seconds
+        while stop is None or deadline < stop:
+            start = loop.time()
+            self.arena.run(step)
+            self.arena.drain_events()
+            self.broadcast(start)
+            self.round_times.append(loop.time() - start)
+            deadline += self.interval
+            if deadline < loop.time():
+                # behind: the arena slows down rather than catching up in a burst
+                self.late += 1
+                deadline = loop.time()
+            await asyncio.sleep(deadline - loop.time())
+
+    def summary(self):
+        ordered = sorted(self.round_times)
+        if not ordered:
+            return "nenhuma rodada"
+        p50, p99 = percentile(ordered, 50), percentile(ordered, 99)
+        return (f"{len(ordered)} rodadas, ate {self.peak_clients} jogadores, rodada p50 {p50 * 1e3:.2f} ms "
+                f"p99 {p99 * 1e3:.2f} ms max {ordered[-1] * 1e3:.2f} ms, {self.late} atrasadas, "
+                f"{self.bytes_sent} bytes enviados")
+
+
+async def serve(host, port, width, height, seed=None, seconds=None):
+    game = GameServer(width, height, seed)
+    server = await asyncio.start_server(game.handle, host, port)
+    async with server:
+        try:
+            await game.run(seconds)
+        finally:
+            game.close()
+            await asyncio.sleep(0)
+            print(game.summary(), flush=True)
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="servidor multijogador da cobrinha")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=PORT)
+    parser.add_argument("--world", metavar="COLUNASxLINHAS", help="tamanho do tabuleiro (ex.: 100x80)")
+    parser.add_argument("--seed", type=int)
+    parser.add_argument("--seconds", type=float, help="encerra depois deste tempo e mostra as medidas")
+    args = parser.parse_args()
+
+    width, height = WIDTH, HEIGHT
+    if args.world:
+        cols, rows = (int(n) for n in args.world.lower().split("x"))
+        width, height = cols * BLOCK_SIZE, rows * BLOCK_SIZE
+    try:
+        asyncio.run(serve(args.host, args.port, width, height, args.seed, args.seconds))
+    except KeyboardInterrupt:
+        pass
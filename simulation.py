@@ -0,0 +1,561 @@
+import random
+from collections import deque
+
+from body import SnakeBody
+from enemies import EnemySwarm
+from grid import OccupancyGrid
+
+# constantes
+
+WIDTH, HEIGHT = 1000, 800
+BLOCK_SIZE = 20
+SNAKE_SPEED = 1
+TICK = 0.005  # seconds per simulation tick
+SNAKE_UPDATE_INTERVAL = 0.1  # seconds
+ENEMY_UPDATE_INTERVAL = 0.5  # seconds
+BOSS_UPDATE_INTERVAL = 0.2  # seconds
+MIN_UPDATE_INTERVAL = 0.1  # seconds
+LEVEL_SPEEDUP = 0.005  # seconds
+INPUT_QUEUE = 3  # turns a snake holds on to, one taken per move
+BOSS_SIGHT = 64  # cells; bosses further from the head than this just head straight for it
+DIRECTIONS = [(0, -1), (0, 1), (-1, 0), (1, 0)]  # cima, baixo, esquerda, direita
+
+# eventos (same names as the sounds the shell plays for them)
+
+EAT = "eat"
+ITEM = "item"
+ENEMY_WAVE = "enemy"
+ENEMY_HIT = "enemy_death"
+BOSS_SPAWN = "boss"
+BOSS_HIT = "boss_death"
+LEVEL_UP = "level_up"
+GAME_OVER = "game_over"
+
+
+def ticks(seconds):
+    return round(seconds / TICK)
+
+
+class Snake:
+    def __init__(self, x, y, width=WIDTH, height=HEIGHT, grid=None, owner=0):
+        if grid is None:
+            grid = OccupancyGrid(width // BLOCK_SIZE, height // BLOCK_SIZE, BLOCK_SIZE)
+        self.grid = grid
+        self.owner = owner  # marked on the grid cells it takes
+        self.head = (x, y)
+        self.previous_head = self.head  # where the head was before the last move, for drawing
+        self.body = SnakeBody()
+        self.body.push_head(grid.cell(self.head))
+        grid.add_snake(self.body.head(), owner)
+        self.direction = (0, -1)
+        self.speed = SNAKE_SPEED
+        self.grow = 0
+        self.name = ""
+        self.turns = deque()  # (direction, tick queued) still to take, oldest first
+        self.width = width
+        self.height = height
+        self.vacated = None  # list of freed cells, only kept while a renderer tracks it
+
+    def move(self):
+        if self.turns:
+            self.direction = self.turns.popleft()[0]
+        new_head = (self.head[0] + self.direction[0] * BLOCK_SIZE * self.speed,
+                    self.head[1] + self.direction[1] * BLOCK_SIZE * self.speed)
+
+        if new_head[0] < 0:
+            new_head = (self.width - BLOCK_SIZE, new_head[1])
+        elif new_head[0] >= self.width:
+            new_head = (0, new_head[1])
+        elif new_head[1] < 0:
+            new_head = (new_head[0], self.height - BLOCK_SIZE)
+        elif new_head[1] >= self.height:
+            new_head = (new_head[0], 0)
+
+        self.previous_head = self.head
+        self.head = new_head
+        cell = self.grid.cell(new_head)
+        self.body.push_head(cell)
+        self.grid.add_snake(cell, self.owner)
+
+        if self.grow > 0:
+            self.grow -= 1
+        else:
+            self.pop_tail()
+
+        return new_head
+
+    def pop_tail(self):
+        cell = self.body.pop_tail()
+        self.grid.remove_snake(cell)
+        if self.vacated is not None:
+            self.vacated.append(cell)
+
+    def trim(self, segments):
+        for _ in range(min(segments, len(self.body))):
+            self.pop_tail()
+
+    def place(self, positions):
+        self.trim(len(self.body))
+        for pos in positions:
+            cell = self.grid.cell(pos)
+            self.body.push_tail(cell)
+            self.grid.add_snake(cell, self.owner)
+        self.head = self.grid.pos(self.body.head())
+
+    def positions(self):
+        cols = self.grid.cols
+        size = self.grid.block_size
+        for cell in self.body:
+            yield (cell % cols * size, cell // cols * size)
+
+    def change_direction(self, direction, tick=0):
+        # queued behind the turns already waiting, and checked against the direction the
+        # snake will be going by then: a reversal or a repeat is dropped, and so is
+        # anything past INPUT_QUEUE turns. True when the turn was queued
+        last = self.turns[-1][0] if self.turns else self.direction
+        if (direction == last or (direction[0] == -last[0] and direction[1] == -last[1])
+                or len(self.turns) >= INPUT_QUEUE):
+            return False
+        self.turns.append((direction, tick))
+        return True
+
+    def grow_snake(self, segments):
+        self.grow += segments
+
+    def check_collision(self):
+        return self.grid.snake[self.grid.cell(self.head)] > 1
+
+
+class Simulation:
+    def __init__(self, width=WIDTH, height=HEIGHT, seed=None, vectorized=False):
+        self.width = width
+        self.height = height
+        if seed is None:
+            seed = random.getrandbits(64)
+        self.seed = seed  # every random choice comes from rng, so seed + inputs replay a game
+        self.rng = random.Random(seed)
+        self.vectorized = vectorized  # enemies in an EnemySwarm (numpy) instead of a list
+        self.reset()
+
+    def reset(self):
+        cx = self.width // 2 // BLOCK_SIZE * BLOCK_SIZE
+        cy = self.height // 2 // BLOCK_SIZE * BLOCK_SIZE
+        self.grid = OccupancyGrid(self.width // BLOCK_SIZE, self.height // BLOCK_SIZE, BLOCK_SIZE)
+        self.snake = Snake(cx, cy, self.width, self.height, self.grid)
+        self.food = []
+        self.items = []
+        self.enemies = EnemySwarm(self.grid) if self.vectorized else []
+        self.set_food(self.generate_food())
+        self.set_items(self.generate_item())
+        self.set_enemies(self.generate_enemies())
+        self.bosses = []
+        self.level = 1
+        self.food_collected = 0
+        self.score = 0
+        self.ticks = 0
+        self.over = False
+        self.events = []
+        self.inputs = []  # (tick, direction) for every change_direction call
+        self.snake_interval = ticks(SNAKE_UPDATE_INTERVAL)
+        self.enemy_interval = ticks(ENEMY_UPDATE_INTERVAL)
+        self.boss_interval = ticks(BOSS_UPDATE_INTERVAL)
+        self.snake_timer = 0
+        self.enemy_timer = 0
+        self.boss_timer = 0
+
+    @property
+    def elapsed_time(self):
+        return self.ticks * TICK
+
+    def spawn_cell(self):
+        # a uniformly random empty cell, already marked occupied; None on a full board
+        cell = self.grid.random_free(self.rng)
+        if cell is None:
+            return None
+        self.grid.occupy(cell)
+        return self.grid.pos(cell)
+
+    def generate_food(self):
+        food_count = self.rng.randint(1, 4)
+        food = []
+        for _ in range(food_count):
+            pos = self.spawn_cell()
+            if pos is None:
+                break
+            bonus = self.rng.randint(0, 3)
+            food.append({"pos": pos, "bonus": bonus})
+        return food
+
+    def generate_item(self):
+        chance = self.rng.randint(1, 100)
+        item_type = 0 if chance <= 25 else 1 if chance <= 50 else 2 if chance <= 75 else 3 if chance <= 95 else 4
+        pos = self.spawn_cell()
+        if pos is None:
+            return []
+        return [{"pos": pos, "type": item_type}]
+
+    def generate_enemies(self):
+        enemy_count = self.rng.randint(1, 5)
+        enemies = []
+        for _ in range(enemy_count):
+            pos = self.spawn_cell()
+            if pos is None:
+                break
+            direction = self.rng.choice([(1, 0), (-1, 0), (0, 1), (0, -1)])
+            enemies.append({"pos": pos, "dir": direction})
+            cell = self.grid.cell(pos)
+            self.grid.enemy[cell] += 1
+            self.grid.enemy_dir[cell] = DIRECTIONS.index(direction)
+        return enemies
+
+    def generate_boss(self):
+        pos = (self.width // 2 - BLOCK_SIZE, self.height // 2 - BLOCK_SIZE)
+        boss = {"pos": pos, "dir": (0, -1), "size": BLOCK_SIZE * 2}
+        self.occupy_boss(boss)
+        return boss
+
+    def move_boss(self, boss, field):
+        # one cell towards the snake head along the shared distance field, to whichever
+        # neighbouring square gets closest; the current direction wins ties
+        grid = self.grid
+        span = boss["size"] // BLOCK_SIZE
+        cell = grid.cell(boss["pos"])
+        boss["prev"] = boss["pos"]
+        far = len(grid.snake)
+        best = min(field.get(c, far) for c in grid.block_cells(cell, span))
+        choice = None
+        for direction in (boss["dir"], *DIRECTIONS):
+            anchor = grid.neighbour(cell, direction)
+            distance = min(field.get(c, far) for c in grid.block_cells(anchor, span))
+            if distance < best:
+                best = distance
+                choice = (direction, anchor)
+        if best == far:
+            # out of sight: along the longer axis of the wrapped offset to a head
+            head = self.boss_targets()[0]
+            dx = (head % grid.cols - cell % grid.cols + grid.cols // 2) % grid.cols - grid.cols // 2
+            dy = (head // grid.cols - cell // grid.cols + grid.rows // 2) % grid.rows - grid.rows // 2
+            direction = ((dx > 0) - (dx < 0), 0) if abs(dx) >= abs(dy) else (0, (dy > 0) - (dy < 0))
+            choice = (direction, grid.neighbour(cell, direction))
+        if choice is not None:
+            boss["dir"] = choice[0]
+            boss["pos"] = grid.pos(choice[1])
+        return boss
+
+    def boss_cells(self, boss):
+        # 2x2 footprint, wrapping around the edges like the snake
+        return self.grid.block_cells(self.grid.cell(boss["pos"]), boss["size"] // BLOCK_SIZE)
+
+    def occupy_boss(self, boss):
+        for cell in self.boss_cells(boss):
+            self.grid.occupy(cell)
+
+    def release_boss(self, boss):
+        for cell in self.boss_cells(boss):
+            self.grid.release(cell)
+
+    def release_cells(self, entities):
+        # food and items fill one cell each; new ones come from spawn_cell already occupied
+        grid = self.grid
+        for entity in entities:
+            grid.release(grid.cell(entity["pos"]))
+
+    def set_food(self, food):
+        self.release_cells(self.food)
+        self.food = food
+        self.food_at = {f["pos"]: f for f in food}
+
+    def set_items(self, items):
+        self.release_cells(self.items)
+        self.items = items
+        self.item_at = {item["pos"]: item for item in items}
+
+    def release_enemies(self, enemies):
+        grid = self.grid
+        for enemy in enemies:
+            grid.remove_enemy(grid.cell(enemy["pos"]))
+
+    def set_enemies(self, enemies):
+        if self.vectorized:
+            self.enemies.release()
+        else:
+            self.release_enemies(self.enemies)
+        self.enemies.clear()
+        self.enemies.extend(enemies)
+
+    def snapshot(self):
+        # the whole game as flat values, for cloning in lookahead search: the grid and
+        # body as bytes, enemies and bosses as tuples. The food and item lists are only
+        # ever replaced, never changed in place, so they are shared rather than copied
+        snake = self.snake
+        if self.vectorized:
+            enemies = self.enemies.snapshot()
+        else:
+            enemies = tuple((enemy["pos"], enemy["dir"]) for enemy in self.enemies)
+        return (self.grid.snapshot(), snake.body.snapshot(), snake.head, snake.direction,
+                tuple(snake.turns), snake.grow, self.food, self.food_at, self.items,
+                self.item_at, enemies, tuple((boss["pos"], boss["dir"], boss["size"]) for boss in self.bosses),
+                self.level, self.food_collected, self.score, self.ticks, self.over, tuple(self.events),
+                len(self.inputs), self.snake_interval, self.enemy_interval, self.boss_interval,
+                self.snake_timer, self.enemy_timer, self.boss_timer, self.rng.getstate())
+
+    def restore(self, state):
+        # into any Simulation with the same board size and enemy backend; the input log
+        # is cut back to where the snapshot was taken. A renderer must repaint afterwards
+        (grid, body, snake_head, direction, turns, grow, self.food, self.food_at,
+         self.items, self.item_at, enemies, bosses, self.level, self.food_collected, self.score,
+         self.ticks, self.over, events, inputs, self.snake_interval, self.enemy_interval,
+         self.boss_interval, self.snake_timer, self.enemy_timer, self.boss_timer, rng) = state
+        snake = self.snake
+        self.grid.restore(grid)
+        snake.body.restore(body)
+        snake.head = snake.previous_head = snake_head
+        snake.direction = direction
+        snake.turns.clear()
+        snake.turns.extend(turns)
+        snake.grow = grow
+        if self.vectorized:
+            self.enemies.restore(enemies)
+        else:
+            self.enemies = [{"pos": pos, "dir": d} for pos, d in enemies]
+        self.bosses = [{"pos": pos, "dir": d, "size": size} for pos, d, size in bosses]
+        self.events = list(events)
+        del self.inputs[inputs:]
+        self.rng.setstate(rng)
+
+    def change_direction(self, direction):
+        self.inputs.append((self.ticks, direction))
+        return self.snake.change_direction(direction, self.ticks)
+
+    def emit(self, kind, info=None):
+        self.events.append((kind, info))
+
+    def drain_events(self):
+        events = self.events
+        self.events = []
+        return events
+
+    def end(self, cause):
+        self.over = True
+        self.emit(GAME_OVER, cause)
+
+    # what enemies and bosses do to the snake; a game with more snakes overrides these
+
+    def enemy_hit(self, cell):
+        # an enemy moved onto the snake at cell and dies; True when that ended the game
+        snake = self.snake
+        snake.pop_tail()
+        self.emit(ENEMY_HIT)
+        if len(snake.body) == 0:
+            self.end("enemy")
+            return True
+        return False
+
+    def boss_hit(self, cells):
+        # a boss footprint landed on the snake; True when that ended the game
+        self.snake.trim(10)
+        self.emit(BOSS_HIT)
+        if len(self.snake.body) <= 1:
+            self.end("boss")
+            return True
+        return False
+
+    def boss_targets(self):
+        # the cells bosses close in on
+        return [self.grid.cell(self.snake.head)]
+
+    def run(self, count):
+        # skip straight to the next due update instead of ticking idle
+        end = self.ticks + count
+        while not self.over and self.ticks < end:
+            idle = min(self.snake_interval - self.snake_timer,
+                       self.enemy_interval - self.enemy_timer,
+                       self.boss_interval - self.boss_timer,
+                       end - self.ticks) - 1
+            if idle > 0:
+                self.ticks += idle
+                self.snake_timer += idle
+                self.enemy_timer += idle
+                self.boss_timer += idle
+            self.tick()
+
+    def tick(self):
+        if self.over:
+            return
+        self.ticks += 1
+        self.snake_timer += 1
+        self.enemy_timer += 1
+        self.boss_timer += 1
+
+        if self.snake_timer >= self.snake_interval:
+            self.snake_timer -= self.snake_interval
+            self.step_snake()
+            if self.over:
+                return
+
+        if self.enemy_timer >= self.enemy_interval:
+            self.enemy_timer -= self.enemy_interval
+            self.step_enemies()
+            if self.over:
+                return
+
+        if self.boss_timer >= self.boss_interval:
+            self.boss_timer -= self.boss_interval
+            self.step_bosses()
+
+    def step_snake(self):
+        snake = self.snake
+        new_head = snake.move()
+
+        if snake.check_collision():
+            self.end("self")
+            return
+
+        # check food collision
+        food = self.food_at.get(new_head)
+        if food is not None:
+            snake.grow_snake(food["bonus"] + 1)
+            self.emit(EAT, food["bonus"])
+            self.set_food(self.generate_food())
+            self.food_collected += 1
+            if self.food_collected % 10 == 0:
+                self.level += 1
+                speedup = ticks(LEVEL_SPEEDUP)
+                floor = ticks(MIN_UPDATE_INTERVAL)
+                self.snake_interval = max(floor, self.snake_interval - speedup)
+                self.enemy_interval = max(floor, self.enemy_interval - speedup)
+                self.boss_interval = max(floor, self.boss_interval - speedup)
+                self.emit(LEVEL_UP, self.level)
+            if self.food_collected % 15 == 0:
+                self.bosses.append(self.generate_boss())
+                self.emit(BOSS_SPAWN)
+
+        self.score = len(snake.body) * self.level - (self.elapsed_time // 2)
+
+        # check item collision
+        item = self.item_at.get(new_head)
+        if item is not None:
+            self.emit(ITEM, item["type"])
+            if item["type"] == 0:
+                snake.grow_snake(5)
+            elif item["type"] == 1:
+                snake.trim(5 if len(snake.body) > 5 else len(snake.body) - 1)
+                if len(snake.body) == 1:
+                    self.end("item")
+                    return
+            elif item["type"] == 2:
+                self.set_enemies(self.generate_enemies())
+                self.emit(ENEMY_WAVE)
+            elif item["type"] == 3:
+                self.enemies.extend(self.generate_enemies())
+            elif item["type"] == 4:
+                self.bosses.append(self.generate_boss())
+                self.emit(BOSS_SPAWN)
+            self.set_items(self.generate_item())
+
+        # a full board may have left nothing to spawn; retry as cells free up
+        if not self.food:
+            self.set_food(self.generate_food())
+        if not self.items:
+            self.set_items(self.generate_item())
+
+    def step_enemies(self):
+        if self.vectorized:
+            self.step_swarm()
+            return
+        grid = self.grid
+        survivors = []
+        for enemy in self.enemies:
+            new_enemy_pos = (enemy["pos"][0] + enemy["dir"][0] * BLOCK_SIZE,
+                             enemy["pos"][1] + enemy["dir"][1] * BLOCK_SIZE)
+
+            if new_enemy_pos[0] < 0:
+                new_enemy_pos = (self.width - BLOCK_SIZE, new_enemy_pos[1])
+            elif new_enemy_pos[0] >= self.width:
+                new_enemy_pos = (0, new_enemy_pos[1])
+            elif new_enemy_pos[1] < 0:
+                new_enemy_pos = (new_enemy_pos[0], self.height - BLOCK_SIZE)
+            elif new_enemy_pos[1] >= self.height:
+                new_enemy_pos = (new_enemy_pos[0], 0)
+
+            new_cell = grid.cell(new_enemy_pos)
+            if grid.snake[new_cell]:
+                if self.enemy_hit(new_cell):
+                    return
+                grid.remove_enemy(grid.cell(enemy["pos"]))
+            else:
+                grid.remove_enemy(grid.cell(enemy["pos"]))
+                grid.add_enemy(new_cell, DIRECTIONS.index(enemy["dir"]))
+                enemy["pos"] = new_enemy_pos
+                survivors.append(enemy)
+        self.enemies = survivors
+        if not self.enemies:
+            self.enemies = self.generate_enemies()
+
+    def step_swarm(self):
+        # same rules as step_enemies: every hit costs the snake its tail, and a hit is
+        # checked again when its turn comes since earlier hits may have freed the cell
+        swarm = self.enemies
+        col, row, cells = swarm.targets()
+        dead = []
+        for index in swarm.hits(cells):
+            cell = int(cells[index])
+            if self.grid.snake[cell]:
+                if self.enemy_hit(cell):
+                    return
+                dead.append(index)
+        swarm.commit(col, row, cells, dead)
+        if not len(swarm):
+            swarm.extend(self.generate_enemies())
+
+    def step_bosses(self):
+        targets = self.boss_targets()
+        if not self.bosses or not targets:
+            return
+        grid = self.grid
+        # one field per boss tick, however many bosses read it
+        field = grid.distances(targets, BOSS_SIGHT)
+        survivors = []
+        for boss in self.bosses:
+            self.release_boss(boss)
+            boss = self.move_boss(boss, field)
+            self.occupy_boss(boss)
+            cells = self.boss_cells(boss)
+            if any(grid.snake[cell] for cell in cells):
+                if self.boss_hit(cells):
+                    return
+                self.release_boss(boss)
+            else:
+                survivors.append(boss)
+        self.bosses = survivors
+
+
+def random_policy(sim, rng):
+    # its own rng, like a player: drawing from sim.rng would shift the game's spawns
+    if rng.random() < 0.1:
+        sim.change_direction(rng.choice([(1, 0), (-1, 0), (0, 1), (0, -1)]))
+
+
+if __name__ == "__main__":
+    import argparse
+    import time
+
+    parser = argparse.ArgumentParser(description="simula partidas sem janela")
+    parser.add_argument("--games", type=int, default=1000)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--max-ticks", type=int, default=200000)
+    parser.add_argument("--numpy", action="store_true", help="inimigos no EnemySwarm")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    total_ticks = 0
+    for game in range(args.games):
+        sim = Simulation(seed=args.seed + game, vectorized=args.numpy)
+        policy = random.Random(args.seed + game)
+        while not sim.over and sim.ticks < args.max_ticks:
+            random_policy(sim, policy)
+            sim.run(max(1, sim.snake_interval - sim.snake_timer))
+        total_ticks += sim.ticks
+    elapsed = time.perf_counter() - start
+    print(f"{args.games} partidas, {total_ticks} ticks em {elapsed:.2f}s "
+          f"({args.games / elapsed:.0f} partidas/s, {total_ticks / elapsed:.0f} ticks/s)")
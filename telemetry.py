@@ -0,0 +1,173 @@
+import glob
+import json
+import os
+import queue
+import threading
+import time
+
+from profiler import percentile
+
+TELEMETRY_DIR = 'telemetria'
+BATCH_SIZE = 256  # events per write at most
+FLUSH_INTERVAL = 1.0  # seconds an event may wait before it is written
+ROTATE_BYTES = 1 << 20  # a file past this size is closed and the next one started
+MAX_FILES = 50  # oldest files are deleted past this many
+QUEUE_SIZE = 50000  # events waiting at most; past that new ones are dropped and counted
+
+
+class TelemetryWriter:
+    # record() runs on the game thread and only puts the event on a queue; a
+    # background thread takes them off in batches and appends them as JSON lines to
+    # <pasta>/<sessao>-NNNN.jsonl, starting a new file every ROTATE_BYTES. The game
+    # never waits for the disk, and a full queue drops events rather than block
+    def __init__(self, pasta=TELEMETRY_DIR, session=None, rotate_bytes=ROTATE_BYTES, max_files=MAX_FILES,
+                 queue_size=QUEUE_SIZE):
+        self.pasta = pasta
+        self.session = session or f"{time.strftime('%Y%m%d-%H%M%S')}-{os.getpid()}"
+        self.rotate_bytes = rotate_bytes
+        self.max_files = max_files
+        self.queue = queue.Queue(queue_size)
+        self.dropped = 0
+        self.written = 0
+        self.index = 0
+        self.file = None
+        self.size = 0
+        self.thread = threading.Thread(target=self.run, name="telemetria", daemon=True)
+        self.thread.start()
+
+    def record(self, kind, **fields):
+        fields["e"] = kind
+        fields["t"] = round(time.time(), 3)
+        try:
+            self.queue.put_nowait(fields)
+        except queue.Full:
+            self.dropped += 1
+
+    def close(self):
+        # writes whatever is still queued; safe to call more than once
+        if self.thread.is_alive():
+            self.queue.put(None)
+            self.thread.join()
+
+    def run(self):
+        os.makedirs(self.pasta, exist_ok=True)
+        running = True
+        while running:
+            batch = []
+            try:
+                event = self.queue.get(timeout=FLUSH_INTERVAL)
+                while True:
+                    if event is None:
+                        running = False
+                        break
+                    batch.append(event)
+                    if len(batch) >= BATCH_SIZE:
+                        break
+                    event = self.queue.get_nowait()
+            except queue.Empty:
+                pass
+            if batch:
+                self.write(batch)
+        if self.file is not None:
+            self.file.close()
+            self.file = None
+
+    def write(self, batch):
+        data = "".join(json.dumps(event, separators=(",", ":")) + "\n" for event in batch).encode("utf-8")
+        if self.file is None or self.size + len(data) > self.rotate_bytes and self.size:
+            self.rotate()
+        self.file.write(data)
+        self.file.flush()
+        self.size += len(data)
+        self.written += len(batch)
+
+    def rotate(self):
+        if self.file is not None:
+            self.file.close()
+        self.index += 1
+        self.file = open(os.path.join(self.pasta, f"{self.session}-{self.index:04d}.jsonl"), 'ab')
+        self.size = self.file.tell()
+        files = sorted(glob.glob(os.path.join(self.pasta, "*.jsonl")), key=os.path.getmtime)
+        for caminho in files[:max(0, len(files) - self.max_files)]:
+            os.remove(caminho)
+
+
+# func
+def read_events(pastas):
+    # every event in the .jsonl files under the given folders (or files), file by file
+    caminhos = []
+    for pasta in pastas:
+        caminhos.extend([pasta] if os.path.isfile(pasta) else sorted(glob.glob(os.path.join(pasta, "*.jsonl"))))
+    for caminho in caminhos:
+        with open(caminho, 'r', encoding='utf-8', errors='replace') as f:
+            for linha in f:
+                try:
+                    yield json.loads(linha)
+                except ValueError:
+                    continue  # a line cut short by a crash
+
+
+def aggregate(events):
+    sessions = set()
+    games = []
+    causes = {}
+    items = {}
+    food = {}
+    counts = {}
+    spikes = []
+    for event in events:
+        kind = event.get("e")
+        counts[kind] = counts.get(kind, 0) + 1
+        if kind == "session":
+            sessions.add(event.get("session"))
+        elif kind == "game_over":
+            games.append(event)
+            causes[event.get("cause")] = causes.get(event.get("cause"), 0) + 1
+        elif kind == "item":
+            items[event.get("type")] = items.get(event.get("type"), 0) + 1
+        elif kind == "eat":
+            food[event.get("bonus")] = food.get(event.get("bonus"), 0) + 1
+        elif kind == "spike":
+            spikes.append(event.get("ms", 0))
+    durations = sorted(game.get("seconds", 0) for game in games)
+    peaks = sorted(game.get("peak_enemies", 0) for game in games)
+    scores = sorted(game.get("score", 0) for game in games)
+    spikes.sort()
+    return {
+        "sessions": len(sessions),
+        "games": len(games),
+        "seconds": {"p50": percentile(durations, 50), "p90": percentile(durations, 90),
+                    "max": durations[-1] if durations else 0},
+        "score": {"p50": percentile(scores, 50), "max": scores[-1] if scores else 0},
+        "causes": causes,
+        "items": {str(kind): count for kind, count in sorted(items.items(), key=lambda i: str(i[0]))},
+        "food": {str(bonus): count for bonus, count in sorted(food.items(), key=lambda i: str(i[0]))},
+        "peak_enemies": {"p50": percentile(peaks, 50), "max": peaks[-1] if peaks else 0},
+        "spikes": {"count": len(spikes), "p50_ms": percentile(spikes, 50), "max_ms": spikes[-1] if spikes else 0},
+        "events": counts,
+    }
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="resume os arquivos de telemetria das partidas")
+    parser.add_argument("pastas", nargs="*", default=[TELEMETRY_DIR])
+    parser.add_argument("--json", action="store_true", help="mostra o resumo em JSON")
+    args = parser.parse_args()
+
+    summary = aggregate(read_events(args.pastas))
+    if args.json:
+        print(json.dumps(summary, indent=2))
+    else:
+        print(f"{summary['sessions']} sessoes, {summary['games']} partidas")
+        print(f"  duracao: p50 {summary['seconds']['p50']:.1f}s  p90 {summary['seconds']['p90']:.1f}s  "
+              f"max {summary['seconds']['max']:.1f}s")
+        print(f"  pontuacao: p50 {summary['score']['p50']}  max {summary['score']['max']}")
+        print(f"  causas da morte: {summary['causes']}")
+        print(f"  itens por tipo: {summary['items']}")
+        print(f"  comidas por bonus: {summary['food']}")
+        print(f"  pico de inimigos por partida: p50 {summary['peak_enemies']['p50']}  "
+              f"max {summary['peak_enemies']['max']}")
+        print(f"  picos de quadro: {summary['spikes']['count']}, p50 {summary['spikes']['p50_ms']} ms, "
+              f"max {summary['spikes']['max_ms']} ms")